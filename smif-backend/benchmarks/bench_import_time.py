@@ -0,0 +1,98 @@
+"""
+Start-up cost of the smif CLI and of what each subcommand imports, read from
+python -X importtime. Fails (exit 1) when a target does not import, or when the
+CLI itself or `check twitter` goes over its budget or pulls in a heavy package
+it should leave to the other subcommands.
+
+    python benchmarks/bench_import_time.py --budget-ms 60 --twitter-budget-ms 500 --top 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# what `python run.py <subcommand>` imports on top of the CLI
+TARGETS = {
+    "cli": "run",
+    "monitor whatsapp": "modules.whatsApp",
+    "monitor spotify": "modules.spotify",
+    "check twitter": "modules.twitterBatch",
+    "import/export": "models",
+}
+HEAVY = ("selenium", "cryptography", "sqlalchemy", "lxml", "aiohttp", "numpy", "PIL", "requests", "tweepy")
+# the cron check only needs http and the html parser, no browser, database or images
+BROWSER_AND_DATABASE = ("selenium", "cryptography", "sqlalchemy", "numpy", "PIL", "tweepy")
+# target: (budget option, packages it must not import)
+BUDGETS = {
+    "cli": ("budget_ms", HEAVY),
+    "check twitter": ("twitter_budget_ms", BROWSER_AND_DATABASE),
+}
+
+
+def import_times(module):
+    """
+    Returns:
+        tuple: (total microseconds, {import made by the target: cumulative microseconds},
+                every module imported, error or None)
+    """
+    setup = f"import sys; sys.path[:0] = {[ROOT, os.path.join(ROOT, 'models'), os.path.join(ROOT, 'services')]!r}"
+    code = f"{setup}; import {module}" if module else setup
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=ROOT)
+    total, children, names, error = 0, {}, set(), None
+    pending, pending_names = {}, set()
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            if line.strip():
+                error = line.strip()
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # every level of nesting adds two spaces, a cumulative time already includes the nested imports
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        # nested imports are printed before their parent, keep them until the parent shows up
+        pending_names.add(name)
+        if depth == 1:
+            pending[name] = pending.get(name, 0) + int(cumulative)
+        elif depth == 0:
+            if name == module:
+                total, children, names = int(cumulative), pending, pending_names
+            pending, pending_names = {}, set()
+    if process.returncode == 0:
+        error = None
+    return total, children, names, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=60.0, help="import time allowed for the CLI itself")
+    parser.add_argument("--twitter-budget-ms", type=float, default=500.0, help="import time allowed for check twitter")
+    parser.add_argument("--top", type=int, default=8, help="slowest top level imports shown per target")
+    args = parser.parse_args()
+
+    failed = False
+    for label, module in TARGETS.items():
+        total, children, names, error = import_times(module)
+        print(f"{label:<18}{module:<20}{total / 1000:>9.1f} ms" + (f"  (import failed: {error})" if error else ""))
+        if error:
+            failed = True
+        for name, cumulative in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {name:<40}{cumulative / 1000:>9.1f} ms")
+        if label in BUDGETS and not error:
+            option, forbidden = BUDGETS[label]
+            budget = getattr(args, option)
+            heavy = sorted({name.split(".")[0] for name in names} & set(forbidden))
+            if heavy:
+                print(f"    {label} imports {', '.join(heavy)}, leave them to the subcommands that need them")
+                failed = True
+            if total / 1000 > budget:
+                print(f"    over the {budget:.0f} ms budget")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Page load time and browser RSS of every WebDriverHandler load profile against a
+local test page with many images, a web font, autoplay video and animations.
+Every image request is delayed to stand in for a real network. Needs Firefox
+and geckodriver, a throwaway profile directory is created per run.
+
+    python benchmarks/bench_load_profiles.py --driver ./geckodriver --runs 3
+"""
+import argparse
+import os
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "models"), os.path.join(ROOT, "services")]
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from services.web_driver_handler import LOAD_PROFILES, WebDriverHandler
+
+
+def make_png(size=256):
+    rows = b"".join(b"\x00" + bytes((x * 7 + y * 3) % 256 for x in range(size * 3)) for y in range(size))
+    chunk = lambda kind, data: struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+PNG = make_png()
+
+
+def make_page(images):
+    tiles = "".join(f"<img src='/img/{i}.png' width='64' height='64'>" for i in range(images))
+    return (
+        "<html><head><title>bench</title><style>"
+        "@font-face {font-family: bench; src: url('/font.woff2');} body {font-family: bench;}"
+        "@keyframes spin {to {transform: rotate(360deg);}} .spin {animation: spin 1s linear infinite;}"
+        "</style></head><body>"
+        "<h1 id='title' class='spin'>load profile bench</h1>"
+        "<video src='/video.webm' autoplay muted loop></video>"
+        f"<div id='tiles'>{tiles}</div></body></html>"
+    ).encode()
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    page = b""
+    delay = 0.0
+
+    def do_GET(self):
+        if self.path == "/":
+            body, kind = self.page, "text/html; charset=utf-8"
+        elif self.path.startswith("/img/"):
+            time.sleep(self.delay)
+            body, kind = PNG, "image/png"
+        elif self.path == "/font.woff2":
+            time.sleep(self.delay)
+            body, kind = os.urandom(64 * 1024), "font/woff2"
+        elif self.path == "/video.webm":
+            time.sleep(self.delay)
+            body, kind = os.urandom(512 * 1024), "video/webm"
+        else:
+            body, kind = b"", "text/plain"
+        self.send_response(200 if body else 404)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def process_tree_rss(pid):
+    """RSS in MiB of a process and all its descendants, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                parent = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        stack.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+def run_profile(args, name, url):
+    profile_dir = tempfile.mkdtemp(prefix=f"smif-bench-{name}-")
+    driver = WebDriverHandler(args.driver, profile_dir).create_webdriver(headless=True, load_profile=name)
+    try:
+        loads, readies = [], []
+        for _ in range(args.runs):
+            driver.get("about:blank")
+            started = time.perf_counter()
+            driver.get(url)
+            loads.append(time.perf_counter() - started)
+            WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.ID, "tiles")))
+            readies.append(time.perf_counter() - started)
+        time.sleep(args.settle)
+        rss = process_tree_rss(driver.capabilities["moz:processID"])
+        return statistics.median(loads), statistics.median(readies), rss
+    finally:
+        driver.quit()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--driver", required=True, help="path to geckodriver")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds every subresource is delayed")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds before RSS is read")
+    parser.add_argument("--profiles", nargs="*", default=list(LOAD_PROFILES))
+    args = parser.parse_args()
+
+    PageHandler.page = make_page(args.images)
+    PageHandler.delay = args.delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    print(f"{'profile':<10}{'strategy':<10}{'get() s':>10}{'ready s':>10}{'RSS MiB':>10}")
+    try:
+        for name in args.profiles:
+            load, ready, rss = run_profile(args, name, url)
+            print(f"{name:<10}{LOAD_PROFILES[name].page_load_strategy:<10}{load:>10.3f}{ready:>10.3f}{rss:>10.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Rows per second of the per-object onlineLog path against the PresenceWriter.
+
+    python benchmarks/bench_presence_writer.py --rows 20000 --targets 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "models")]
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from services.presence_writer import PresenceWriter
+
+
+def make_database(path, targets):
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    entries = [models.whatsAppdb(phoneNumber=f"+1000000{i:04d}") for i in range(targets)]
+    session.add_all(entries)
+    session.commit()
+    ids = [entry.whatsappUserId for entry in entries]
+    session.close()
+    return Session, ids
+
+
+def bench_orm(Session, ids, rows):
+    # what storeActiveStatus does today, committed after every poll
+    session = Session()
+    entries = session.query(models.whatsAppdb).all()
+    started = time.perf_counter()
+    for i in range(rows):
+        entries[i % len(entries)].onlineLog.append(models.onlineLog(status=bool(i & 1)))
+        session.commit()
+    elapsed = time.perf_counter() - started
+    session.close()
+    return elapsed
+
+
+def bench_writer(Session, ids, rows, batch_size):
+    writer = PresenceWriter(session_factory=Session, batch_size=batch_size, flush_interval=1.0)
+    started = time.perf_counter()
+    for i in range(rows):
+        writer.add(ids[i % len(ids)], bool(i & 1))
+    writer.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--targets", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Session, ids = make_database(os.path.join(tmp, "orm.db"), args.targets)
+        orm = bench_orm(Session, ids, args.rows)
+        Session, ids = make_database(os.path.join(tmp, "writer.db"), args.targets)
+        writer = bench_writer(Session, ids, args.rows, args.batch_size)
+
+    print(f"{'path':<16}{'seconds':>10}{'rows/s':>14}")
+    print(f"{'orm per object':<16}{orm:>10.2f}{args.rows / orm:>14.0f}")
+    print(f"{'PresenceWriter':<16}{writer:>10.2f}{args.rows / writer:>14.0f}")
+    print(f"speedup x{orm / writer:.1f}")
+
+
+if __name__ == "__main__":
+    main()
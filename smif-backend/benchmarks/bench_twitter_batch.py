@@ -0,0 +1,86 @@
+"""
+TwitterBatchChecker against a local stand-in server serving xcancel shaped pages,
+no network needed. Usernames starting with "p" are protected, "missing" ones 404.
+
+    python benchmarks/bench_twitter_batch.py --accounts 500 --rate 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "models"), os.path.join(ROOT, "services")]
+
+from modules.twitterBatch import TwitterBatchChecker
+
+PROTECTED_PAGE = (
+    b"<html><head><title>xcancel</title></head><body><nav class='nav-bar'></nav>"
+    b"<div class='container'><div class='profile-tab'><div class='profile-card'></div></div>"
+    b"<div class='timeline-container'><div class='timeline-header timeline-protected'>"
+    b"<h2>This account's tweets are protected.</h2><p>Only confirmed followers have access.</p>"
+    b"</div></div></div></body></html>"
+)
+PUBLIC_PAGE = (
+    b"<html><head><title>xcancel</title></head><body><nav class='nav-bar'></nav>"
+    b"<div class='container'><div class='timeline'>"
+    + b"<div class='timeline-item'><div class='tweet-body'><p>tweet text</p></div></div>" * 400
+    + b"</div></div></body></html>"
+)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        username = self.path.strip("/")
+        if username.startswith("missing"):
+            body, status = b"<html><body><div class='error-panel'>User not found</div></body></html>", 404
+        else:
+            body, status = (PROTECTED_PAGE if username.startswith("p") else PUBLIC_PAGE), 200
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=200.0, help="requests per second allowed to the host")
+    args = parser.parse_args()
+
+    server = start_stand_in()
+    usernames = [f"{'p' if i % 3 == 0 else 'u'}{i}" for i in range(args.accounts)] + ["missing0"]
+    checker = TwitterBatchChecker(
+        baseUrl=f"http://127.0.0.1:{server.server_port}",
+        concurrency=args.concurrency,
+        perHost=args.concurrency,
+        ratePerHost=args.rate,
+    )
+    started = time.perf_counter()
+    checks = checker.check(usernames)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    wrong = [check for check in checks if check.protected is not None and check.protected != check.username.startswith("p")]
+    print(f"{len(checks)} accounts in {elapsed:.2f}s ({len(checks) / elapsed:.0f}/s)")
+    print(f"protected {sum(1 for c in checks if c.protected)}, public {sum(1 for c in checks if c.protected is False)}, "
+          f"failed {sum(1 for c in checks if c.protected is None)}, misclassified {len(wrong)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,170 @@
-from sqlalchemy import (create_engine, Column, Integer, String, Date, ForeignKey, DateTime, MetaData, Boolean)
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy import (create_engine, Column, Integer, String, Date, ForeignKey, DateTime, MetaData, Boolean, Index, event, inspect, text, func)
+from sqlalchemy.orm import relationship, sessionmaker, scoped_session, Session
 from sqlalchemy.ext.declarative import declarative_base
-from datetime import datetime
+from datetime import datetime, timedelta
+import os
+import threading
+
+
+DATABASE_URL = 'sqlite:///SMIF.db'
+
+# applied on every new sqlite connection, override with configureDatabase(pragmas=...)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,      # negative is KiB, so 64MB
+    'mmap_size': 268435456,
+    'busy_timeout': 10000,     # ms to wait on a locked db instead of failing
+    'foreign_keys': 'ON',
+}
+
+# columns added to tables that older SMIF.db files already have, create_all never ALTERs a table
+ADDED_COLUMNS = {
+    'whatsApp': ('currentPHash',),
+    'profilePicsLog': ('picPHash',),
+    'spotify': ('playlistUrl',),
+}
+
+# PRAGMA user_version of a sqlite db whose data migrations have run
+DATA_VERSION = 1
+
+_engine = None
+_sessionFactory = None
+_sessionRegistry = None
+_enginePid = None
+_engineLock = threading.RLock()
+
+
+def configureDatabase(url=DATABASE_URL, pragmas=None, **engineKwargs):
+    """
+    Create the process wide engine and session registry and create the schema once.
+    Calling it again replaces the engine, e.g. to point at another db file.
+
+    Args:
+        url (str): database url
+        pragmas (dict): sqlite pragmas merged over SQLITE_PRAGMAS, a None value drops one
+        **engineKwargs: passed to create_engine
+
+    Returns:
+        Engine
+    """
+    global _engine, _sessionFactory, _sessionRegistry, _enginePid
+    with _engineLock:
+        if _engine is not None:
+            _sessionRegistry.remove()
+            _engine.dispose()
+
+        engine = create_engine(url, **engineKwargs)
+        if engine.dialect.name == 'sqlite':
+            sqlitePragmas = {**SQLITE_PRAGMAS, **(pragmas or {})}
+
+            @event.listens_for(engine, 'connect')
+            def setSqlitePragmas(dbapiConnection, connectionRecord):
+                cursor = dbapiConnection.cursor()
+                for name, value in sqlitePragmas.items():
+                    if value is not None:
+                        cursor.execute(f'PRAGMA {name}={value}')
+                cursor.close()
 
+        Base.metadata.create_all(engine)
+        migrateDatabase(engine)
+        _engine = engine
+        _sessionFactory = sessionmaker(bind=engine)
+        _sessionRegistry = scoped_session(_sessionFactory)
+        _enginePid = os.getpid()
+        return engine
+
+
+def migrateDatabase(engine):
+    """
+    Bring a db made by an older version up to the models: add the columns of
+    ADDED_COLUMNS it is missing, then the indexes of the models it is missing.
+    Every step checks the schema first, so running it on a current db changes nothing.
+    On sqlite the data migrations below DATA_VERSION run once, tracked in PRAGMA user_version:
+    1 folds the onlineLog history from before presenceInterval into intervals.
+
+    Args:
+        engine (Engine)
+
+    Returns:
+        list: the "table.column" names added.
+    """
+    added = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        for tableName, columnNames in ADDED_COLUMNS.items():
+            if tableName not in tables:
+                continue
+            # PRAGMA table_info on sqlite
+            existing = {column['name'] for column in inspector.get_columns(tableName)}
+            table = Base.metadata.tables[tableName]
+            for columnName in columnNames:
+                if columnName in existing:
+                    continue
+                column = table.c[columnName]
+                columnType = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE "{tableName}" ADD COLUMN "{columnName}" {columnType}'))
+                added.append(f'{tableName}.{columnName}')
+        # create_all skips the indexes of tables that already existed
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        if engine.dialect.name == 'sqlite' and connection.exec_driver_sql('PRAGMA user_version').scalar() < DATA_VERSION:
+            session = Session(bind=connection)
+            try:
+                userIds = [userId for (userId,) in session.query(onlineLog.whatsappUserId).distinct() if userId is not None]
+                for whatsappUserId in userIds:
+                    presenceInterval.compactOnlineLog(session, whatsappUserId)
+                session.flush()
+            finally:
+                session.close()
+            connection.exec_driver_sql(f'PRAGMA user_version = {DATA_VERSION}')
+    return added
+
+
+def getEngine():
+    """ the shared engine, configured with the defaults on first use """
+    global _enginePid
+    with _engineLock:
+        if _engine is None:
+            configureDatabase()
+        elif _enginePid != os.getpid():
+            # forked child, drop the parent's pooled connections without closing them
+            _engine.dispose(close=False)
+            _sessionRegistry.remove()
+            _enginePid = os.getpid()
+        return _engine
 
 
 def createSession():
+    """
+    Session scoped to the current thread, every caller in the thread shares it.
+    """
     try:
-        engine = create_engine('sqlite:///SMIF.db')
-        Base.metadata.create_all(engine)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        return session
+        getEngine()
+        return _sessionRegistry()
+    except:
+        return False
+
+
+def openSession():
+    """
+    New session that is not shared with the thread, the caller closes it.
+    """
+    try:
+        getEngine()
+        return _sessionFactory()
     except:
         return False
 
+
+def removeSession():
+    """ close the session of the current thread, call it when a worker thread ends """
+    if _sessionRegistry is not None:
+        _sessionRegistry.remove()
+
 Base = declarative_base()
 
 class Persondb(Base):
@@ -82,6 +232,7 @@ class whatsAppdb(Base):
     currentProfilePic = Column(String(100))
     currentAbout = Column(String(140))
     currentHash = Column(String(32), nullable=True, unique=True)
+    currentPHash = Column(String(16), nullable=True) # perceptual hash of the small image
     
     currentbussinessCover = Column(String(100), nullable=True, default=None) 
     currentbussinessName = Column(String(50), nullable=True, default=None)
@@ -100,6 +251,7 @@ class whatsAppdb(Base):
     aboutLog = relationship('aboutLog', back_populates='whatsAppUser')
     profilePicLog = relationship('profilePicsLog', back_populates='whatsAppUser')
     onlineLog = relationship('onlineLog', back_populates='whatsAppUser')
+    presenceIntervals = relationship('presenceInterval', back_populates='whatsAppUser')
     bDataLog = relationship('bussnissDataLog', back_populates='whatsAppUser')
 
 
@@ -114,6 +266,112 @@ class onlineLog(Base):
     whatsAppUser = relationship('whatsAppdb', back_populates='onlineLog')
 
 
+class presenceInterval(Base):
+    '''
+        run length encoded presence, one row per online/offline session
+        instead of one onlineLog row per poll
+    '''
+    __tablename__ = 'presenceInterval'
+    intervalId = Column(Integer, primary_key=True)
+    startTime = Column(DateTime, nullable=False)
+    endTime = Column(DateTime, nullable=False)
+    status = Column(Boolean, nullable=False)
+
+    whatsappUserId = Column(Integer, ForeignKey('whatsApp.whatsappUserId'), nullable=False)
+    whatsAppUser = relationship('whatsAppdb', back_populates='presenceIntervals')
+
+    __table_args__ = (Index('ix_presenceInterval_user_status_start', 'whatsappUserId', 'status', 'startTime'),)
+
+    @staticmethod
+    def recordPresence(session, whatsappUserId, status, timeStamp=None, lastInterval=None, maxGap=300):
+        """
+        Extend the last interval of the target while the status stays the same,
+        start a new one on a transition or after a gap in the samples.
+
+        Args:
+            session
+            whatsappUserId (int)
+            status (bool): True if the target is online.
+            timeStamp (datetime): time of the sample, defaults to now.
+            lastInterval (presenceInterval): the interval returned by the previous call, saves the lookup query.
+            maxGap (int): seconds without samples after which the interval is not extended.
+
+        Returns:
+            presenceInterval: the interval holding this sample, pass it back as lastInterval.
+        """
+        timeStamp = timeStamp or datetime.now()
+        if lastInterval is None:
+            lastInterval = session.query(presenceInterval).filter_by(whatsappUserId=whatsappUserId) \
+                .order_by(presenceInterval.startTime.desc()).first()
+
+        if lastInterval is not None and lastInterval.status == status \
+                and timedelta(0) <= timeStamp - lastInterval.endTime <= timedelta(seconds=maxGap):
+            lastInterval.endTime = timeStamp
+            return lastInterval
+
+        interval = presenceInterval(whatsappUserId=whatsappUserId, status=status, startTime=timeStamp, endTime=timeStamp)
+        session.add(interval)
+        return interval
+
+    @staticmethod
+    def compactOnlineLog(session, whatsappUserId, maxGap=300):
+        """
+        Fold the onlineLog samples of the target taken before its first presence interval
+        into intervals, the history from when every poll was an onlineLog row.
+        Later samples, e.g. from a PresenceWriter, are already covered by intervals,
+        so running it again folds nothing. The samples are left in place.
+
+        Returns:
+            int: number of samples folded.
+        """
+        firstStart = session.query(func.min(presenceInterval.startTime)) \
+            .filter(presenceInterval.whatsappUserId == whatsappUserId).scalar()
+        samples = session.query(onlineLog.timeStamp, onlineLog.status).filter(onlineLog.whatsappUserId == whatsappUserId)
+        if firstStart is not None:
+            samples = samples.filter(onlineLog.timeStamp < firstStart)
+        lastInterval = None
+        folded = 0
+        for timeStamp, status in samples.order_by(onlineLog.timeStamp).yield_per(1000):
+            if lastInterval is None:
+                # not recordPresence's lookup, that would extend the newest interval
+                lastInterval = presenceInterval(whatsappUserId=whatsappUserId, status=status, startTime=timeStamp, endTime=timeStamp)
+                session.add(lastInterval)
+            else:
+                lastInterval = presenceInterval.recordPresence(session, whatsappUserId, status, timeStamp,
+                                                               lastInterval=lastInterval, maxGap=maxGap)
+            folded += 1
+        return folded
+
+    @staticmethod
+    def intervalsBetween(session, whatsappUserId, startTime, endTime, status=True):
+        """
+        Intervals of the target overlapping [startTime, endTime], clipped to it.
+
+        Returns:
+            list: (start, end) tuples ordered by start.
+        """
+        # the intervals of one target and status do not overlap, so the last one starting by startTime
+        # is the only earlier one that can reach into the range; its start bounds the index scan from below
+        lowerBound = session.query(func.max(presenceInterval.startTime)).filter(
+            presenceInterval.whatsappUserId == whatsappUserId,
+            presenceInterval.status == status,
+            presenceInterval.startTime <= startTime,
+        ).scalar_subquery()
+        rows = session.query(presenceInterval.startTime, presenceInterval.endTime).filter(
+            presenceInterval.whatsappUserId == whatsappUserId,
+            presenceInterval.status == status,
+            presenceInterval.startTime >= func.coalesce(lowerBound, startTime),
+            presenceInterval.startTime <= endTime,
+            presenceInterval.endTime >= startTime,
+        ).order_by(presenceInterval.startTime).all()
+        return [(max(start, startTime), min(end, endTime)) for start, end in rows]
+
+    @staticmethod
+    def onlineIntervals(session, whatsappUserId, startTime, endTime):
+        """ online intervals of the target between startTime and endTime """
+        return presenceInterval.intervalsBetween(session, whatsappUserId, startTime, endTime, status=True)
+
+
 
 
 class aboutLog(Base):
@@ -133,11 +391,24 @@ class profilePicsLog(Base):
     dateChanged = Column(DateTime , default = datetime.now())
     picPath = Column(String(100))
     picHash = Column(String(32), nullable=False, unique=True)
+    picPHash = Column(String(16), nullable=True, index=True)
 
     whatsappUserId = Column(Integer, ForeignKey('whatsApp.whatsappUserId'))
     whatsAppUser = relationship('whatsAppdb', back_populates='profilePicLog')
 
 
+class mediaBlob(Base):
+    '''
+        index of the content addressed media store, one row per unique file
+    '''
+    __tablename__ = 'mediaBlob'
+    hash = Column(String(64), primary_key=True)
+    path = Column(String(200), nullable=False)
+    size = Column(Integer)
+    refCount = Column(Integer, nullable=False, default=0)
+    createdAt = Column(DateTime, default=datetime.now)
+
+
 class bussnissDataLog(Base):
     __tablename__ = 'bussnissDataLog'
     bDataId = Column(Integer, primary_key=True)
@@ -153,11 +424,27 @@ class Spotify(Base):
     __tablename__ = 'spotify'
     Id = Column(Integer, primary_key=True)
     personId = Column(Integer, ForeignKey('person.userId'))
+    playlistUrl = Column(String(200), nullable=True)
     playlistSongsNumber = Column(Integer)
     storedDate = Column(DateTime, default=datetime.now)
 
 
     person = relationship('Persondb', back_populates='spotifyEntries')
+    songsLog = relationship('spotifyPlaylistLog', back_populates='spotify')
+
+
+class spotifyPlaylistLog(Base):
+    '''
+        one row per change of the playlist songs number
+    '''
+    __tablename__ = 'spotifyPlaylistLog'
+    logId = Column(Integer, primary_key=True)
+    dateChanged = Column(DateTime, default=datetime.now)
+    oldSongsNumber = Column(Integer)
+    songsNumber = Column(Integer, nullable=False)
+
+    spotifyId = Column(Integer, ForeignKey('spotify.Id'), index=True)
+    spotify = relationship('Spotify', back_populates='songsLog')
 
 
 
@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 
-import SharedMethods
+from services import sharedMethods
 
 
 
@@ -1,11 +1,41 @@
-import SharedMethods
-from Person import *
+from services import sharedMethods
+from person import Person
 import models 
 import re
-from lxml import html
+import time
+from datetime import datetime
+from services.http_handler import ValidatorCache
+from services.html_extractor import HtmlExtractor
+from services.async_http_handler import AsyncHttpHandler
 
 
-logger = SharedMethods.logSetup.log("Spotify","log.txt")
+logger = sharedMethods.logSetup.log("Spotify","log.txt")
+
+songsPattern = re.compile(r"\b(\d+)\s+songs\b")
+
+# the songs count is in the head metas, the extractor stops reading at the end of the head
+playlistExtractor = HtmlExtractor(meta=('og:description', 'description'), meta_index=(6,))
+
+
+def songsNumberFromMeta(values):
+    for playlistInfo in values.values():
+        if playlistInfo and 'songs' in playlistInfo.lower():
+            match = songsPattern.search(playlistInfo)
+            if match:
+                return int(match.group(1))
+    return None
+
+
+def parseSongsNumber(content):
+    """
+        read the number of songs from a playlist page
+
+        Args:
+            content (bytes): the playlist page html
+        Returns:
+            int: The number of songs, None if the page has no songs info
+    """
+    return songsNumberFromMeta(playlistExtractor.extract_chunks([content]).values)
 
 class Spotify(Person):
     def __init__(self, name=None, username=None, playlistUrl=None):
@@ -24,12 +54,20 @@ class Spotify(Person):
             Returns:
                 int: The number of the playlist song
         """
-        response = SharedMethods.BaseClass.sendRequest(playlistUrl)
+        cache = ValidatorCache.default()
+        result = playlistExtractor.extract_url(playlistUrl, headers=cache.request_headers(playlistUrl))
+        response = result.response
+        cached = cache.record(playlistUrl, response)
+        if cached:
+            # 304, the playlist page did not change since the last count
+            self.currentNumber = cached.payload
+            return self.currentNumber
         if response.status_code == 200:
-            tree = html.fromstring(response.content)
-            playlistInfo = tree.xpath('/html/head/meta[6]')[0].get("content")
-            if 'songs' in playlistInfo.lower():
-                return self.extractSongsNumber(playlistInfo)
+            songsNum = songsNumberFromMeta(result.values)
+            if songsNum is not None:
+                self.currentNumber = songsNum
+                cache.update(playlistUrl, response, payload=songsNum)
+                return songsNum
             else:
                 self.logger.error("every thing is ok, but no songs in the playlist info")
         else:
@@ -45,11 +83,8 @@ class Spotify(Person):
             Returns:
                 int: The number of songs if found, otherwise returns None.
         """
-        # Regular expression pattern to extract the number of songs
-        pattern = r"\b(\d+)\s+songs\b"
-
-        # Search for the pattern in the string
-        match = re.search(pattern, playlistInfo)
+        # Search for the songs number pattern in the string
+        match = songsPattern.search(playlistInfo)
 
         # Check if a match is found
         if match:
@@ -60,9 +95,44 @@ class Spotify(Person):
         else:
             return None
 
+    def getSpotifyEntry(self):
+        """
+            the spotify row of the person for this playlist, added with the playlist url if missing,
+            SpotifyTracker only sweeps the rows that have one
+
+            Returns:
+                models.Spotify: None if the person is not in the database
+        """
+        if not self.persondb:
+            self.logger.error("the person is not in the database")
+            return None
+        entries = self.persondb.spotifyEntries
+        entry = next((entry for entry in entries if entry.playlistUrl == self.playlistUrl), None)
+        if entry is None:
+            # a row stored before the url was kept gets it now
+            entry = next((entry for entry in entries if entry.playlistUrl is None), None)
+        if entry is None:
+            entry = models.Spotify()
+            entries.append(entry)
+        entry.playlistUrl = self.playlistUrl
+        return entry
+
+    def trackPlaylist(self):
+        """
+            store the playlist url of the person so SpotifyTracker sweeps it
+
+            Returns:
+                bool: True if it is stored
+        """
+        if not self.playlistUrl or self.getSpotifyEntry() is None:
+            self.logger.error("no playlist url or person to track")
+            return False
+        self.session.commit()
+        return True
+
     def checkSongsNumChang(self):
         try:
-            oldNum = self.persondb.spotifyEntries[0]
+            oldNum = self.getSpotifyEntry()
             if self.playlistUrl :
                 if oldNum.playlistSongsNumber != self.findPlaylistSongsNumber(self.playlistUrl):
                     return True
@@ -75,11 +145,93 @@ class Spotify(Person):
 
     def storeNewNumber(self):
         if self.currentNumber:
-            self.persondb.spotifyEntries[0].playlistSongsNumber = self.currentNumber
+            spotifyEntry = self.getSpotifyEntry()
+            if spotifyEntry is None:
+                return False
+            if spotifyEntry.playlistSongsNumber != self.currentNumber:
+                spotifyEntry.songsLog.append(models.spotifyPlaylistLog(oldSongsNumber=spotifyEntry.playlistSongsNumber, songsNumber=self.currentNumber))
+            spotifyEntry.playlistSongsNumber = self.currentNumber
             self.session.commit()
             return True
 
 
+class SpotifyTracker:
+    """
+        sweep every tracked playlist in the database in one go,
+        fetched concurrently and committed once per batch
+    """
+    def __init__(self, concurrency=32, perHost=8, batchSize=1000):
+        self.logger = logger
+        self.batchSize = batchSize
+        self.http = AsyncHttpHandler(concurrency=concurrency, per_host=perHost, logger=logger)
+
+    def loadPlaylists(self, session):
+        """
+            Returns:
+                dict: playlistUrl -> list of (spotify Id, stored songs number), from one query
+        """
+        playlists = {}
+        rows = session.query(models.Spotify.Id, models.Spotify.playlistUrl, models.Spotify.playlistSongsNumber) \
+            .filter(models.Spotify.playlistUrl.isnot(None)).all()
+        for spotifyId, playlistUrl, songsNumber in rows:
+            playlists.setdefault(playlistUrl, []).append((spotifyId, songsNumber))
+        return playlists
+
+    def sweepBatch(self, session, playlists):
+        """
+            fetch a batch of playlists and store the changes with one commit
+
+            Args:
+                playlists (dict): playlistUrl -> list of (spotify Id, stored songs number)
+            Returns:
+                dict: fetched, failed and changed counts of the batch
+        """
+        now = datetime.now()
+        updates, events = [], []
+        failed = 0
+        for result in self.http.run_batch(playlists):
+            songsNumber = parseSongsNumber(result.body) if result.ok else None
+            if songsNumber is None:
+                failed += 1
+                continue
+            for spotifyId, oldNumber in playlists[result.url]:
+                if songsNumber != oldNumber:
+                    updates.append({'Id': spotifyId, 'playlistSongsNumber': songsNumber, 'storedDate': now})
+                    events.append({'spotifyId': spotifyId, 'oldSongsNumber': oldNumber, 'songsNumber': songsNumber, 'dateChanged': now})
+        try:
+            if updates:
+                session.bulk_update_mappings(models.Spotify, updates)
+                session.execute(models.spotifyPlaylistLog.__table__.insert(), events)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.logger.error(f"error storing the playlists batch {e}")
+            raise
+        return {'fetched': len(playlists) - failed, 'failed': failed, 'changed': len(events)}
+
+    def sweep(self):
+        """
+            check every tracked playlist once
+
+            Returns:
+                dict: totals of fetched, failed and changed playlists and the elapsed seconds
+        """
+        startTime = time.time()
+        session = models.openSession()
+        totals = {'fetched': 0, 'failed': 0, 'changed': 0}
+        try:
+            playlists = list(self.loadPlaylists(session).items())
+            for start in range(0, len(playlists), self.batchSize):
+                batch = self.sweepBatch(session, dict(playlists[start:start + self.batchSize]))
+                for key in totals:
+                    totals[key] += batch[key]
+        finally:
+            session.close()
+        totals['elapsed'] = time.time() - startTime
+        self.logger.info(f"swept {totals['fetched']} playlists in {totals['elapsed']:.1f}s, {totals['changed']} changed, {totals['failed']} failed")
+        return totals
+
+
 if __name__ == "__main__":
     print("hello")
     
\ No newline at end of file
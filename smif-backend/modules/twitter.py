@@ -1,10 +1,8 @@
-import SharedMethods
-from Person import *
+from services import sharedMethods
+from person import Person
 from models import *
 import requests
-from lxml import html
 import json
-import tweepy
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -12,12 +10,20 @@ from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
 import time
 from datetime import datetime 
+from modules.twitterBatch import ProtectedCheck, TwitterBatchChecker, protectedExtractor, protectedText
+from services.tiered_fetcher import TieredFetcher, NOT_FOUND
+from services.wait_handler import WaitHandler
+from services import web_driver_handler
 
 
 webdriverPath = "/home/mr124/Documents/Projects/SMIF/geckodriver"
 profilePath =  "/home/mr124/Documents/Projects/SMIF/WhatsAppProfile"
+# only text is read from x.com
+loadProfile = "text"
+# set to a services.profile_manager.ProfileManager(profilePath) to give every driver its own clone
+profileManager = None
 
-logger = SharedMethods.logSetup.log("Twitter","log.txt")
+logger = sharedMethods.logSetup.log("Twitter","log.txt")
 
 
 class XPath():
@@ -32,12 +38,17 @@ class XPath():
 
 
 class Twitter(Person, XPath):
+	# http extractor first, the browser one only when it fails or returns None
+	fetchTiers = {'protected': ('NoAPICheckIfProtectedAcc', 'browserCheckIfProtectedAcc')}
+
 	def __init__(self, name=None, dateOfBirth=None, phoneNumber=None, nickName=None, username=None, apiFilePath=None, apiPass=None):
 		super().__init__(name, dateOfBirth, phoneNumber, nickName, username)
 		self.logger = logger
 		self.Xpath = XPath()
 		self.webdriverPath = webdriverPath
 		self.profilePath = profilePath
+		self.loadProfile = loadProfile
+		self.clonePath = None
 		self.apiPass = apiPass
 		self.apiFilePath = apiFilePath
 
@@ -49,34 +60,65 @@ class Twitter(Person, XPath):
 			just it load the api tokesn from encrypted file
 		'''
 		if self.apiFilePath and self.apiPass:
-			encryptedData = SharedMethods.Encrypt(password=self.apiPass,filePath=self.apiFilePath)
-			try:
-				encryptedData.loadData()
-				self.apiToken = encryptedData.data
+			# cheap after the first instance, the vault caches the key and the decrypted tokens
+			encryptedData = sharedMethods.Encrypt(password=self.apiPass,filePath=self.apiFilePath)
+			self.apiToken = encryptedData.loadData()
+			if self.apiToken is not None:
 				self.logger.info("Done decryption ")
-			except Exception as e:
+			else:
 				self.logger.error("Error in loading the api tokens")
 		else:
 			self.logger.error("No ApiFilePath or Pass")
 			return None
 		
 	# Selenium Part 
-	def creatXdriver(self, HeadLess=None):
+	def creatXdriver(self, HeadLess=None, pool=None):
 		try:
-			driver = SharedMethods.BaseClass.CreatWebDriver(self.webdriverPath, self.profilePath, HeadLess=HeadLess)
+			if pool:
+				# lease a warm driver, give it back with releaseDriver
+				self.pooledDriver = pool.acquire(self.profilePath)
+				self.driverPool = pool
+				driver = self.pooledDriver.driver
+			else:
+				# a private copy of the logged in profile, so several drivers can run at once
+				self.clonePath = profileManager.clone(self.profilePath) if profileManager else None
+				handler = web_driver_handler.WebDriverHandler(self.webdriverPath, self.clonePath or self.profilePath)
+				driver = handler.create_webdriver(headless=bool(HeadLess), load_profile=self.loadProfile)
 			self.logger.info("driver has been created")
 			self.driver = driver
 			return True
 		except Exception as e:
 			self.logger.error("Couldn't create Driver",e)
 			return False
+
+	def releaseDriver(self):
+		try:
+			if getattr(self, 'pooledDriver', None):
+				self.driverPool.release(self.pooledDriver)
+				self.pooledDriver = None
+			else:
+				self.driver.quit()
+				if self.clonePath:
+					profileManager.remove(self.clonePath)
+					self.clonePath = None
+			self.driver = None
+			return True
+		except Exception as e:
+			self.logger.error(f"Couldn't release the driver {e}")
+			return False
 		
-	def checkIfElementIsLoadedByXpath(self, elementXpath):
+	def waits(self):
+		# one wait handler per driver, the step timings are shared by all of them
+		if getattr(self, 'waitHandler', None) is None or self.waitHandler.driver is not self.driver:
+			self.waitHandler = WaitHandler(self.driver, logger=self.logger)
+		return self.waitHandler
+
+	def checkIfElementIsLoadedByXpath(self, elementXpath, step='elementLoaded'):
 		try:
-			element = WebDriverWait(self.driver, 120).until(EC.presence_of_element_located((By.XPATH, elementXpath)))
+			# presence only, the text load profile never fetches the images
+			element = self.waits().element(step, elementXpath, 120)
 			if element:
 				self.logger.info("element is loaded in the page")
-				time.sleep(3)
 				return True
 		except TimeoutException as e:
 			self.logger.error("Time out on loading whatsApp")
@@ -87,7 +129,7 @@ class Twitter(Person, XPath):
 	def goToUserPage(self):
 		try:
 			self.driver.get(f"{self.Xpath.XUrl}{self.username}")
-			isLoded = self.checkIfElementIsLoadedByXpath(elementXpath=self.Xpath.nameDiv)
+			isLoded = self.checkIfElementIsLoadedByXpath(elementXpath=self.Xpath.nameDiv, step='userPage')
 			if isLoded:
 				return True
 			else:
@@ -98,15 +140,51 @@ class Twitter(Person, XPath):
 
 	def checkIfProtectedAcc(self):
 		'''
-
+			Returns:
+				True if protected, False if public, None if the page did not load
 		'''
 		try:
-			self.goToUserPage()
+			if not self.goToUserPage():
+				return None
 			element = self.driver.find_element(By.XPATH, self.Xpath.protectedUserInfoDiv)
 			if 'protected' in element.text:
 				return True  
+			return False
 		except:
 			self.logger.info("Account Not Protected")	
+			return False
+
+	def browserCheckIfProtectedAcc(self):
+		'''
+			browser tier of isProtected, uses the open driver if there is one,
+			otherwise starts one (leased from browserPool when set) and releases it before returning
+		'''
+		if getattr(self, 'driver', None):
+			return self.checkIfProtectedAcc()
+		if not self.creatXdriver(HeadLess=True, pool=getattr(self, 'browserPool', None)):
+			return None
+		try:
+			return self.checkIfProtectedAcc()
+		finally:
+			self.releaseDriver()
+
+	def isProtected(self, fetcher=None, pool=None):
+		'''
+			protected check over http, paying for a browser only if http has no answer
+
+			Args:
+				fetcher (TieredFetcher): defaults to the process wide one
+				pool (WebDriverPool): lease the browser tier's driver from it instead of starting a new firefox
+
+			Returns:
+				True if protected, False if public, NOT_FOUND (falsy) if the account does not exist,
+				None if no tier could tell
+		'''
+		fetcher = fetcher or TieredFetcher.default()
+		self.browserPool = pool
+		outcome = fetcher.fetch(self, 'protected')
+		self.logger.info(f"protected check of {self.username} answered by the {outcome.tier} tier")
+		return outcome.value
 
 
 	# Useless - No API section  - Rate LIMIT MY ASS
@@ -115,17 +193,17 @@ class Twitter(Person, XPath):
 			self.logger.error("No username to check for")
 			return
 			
-		textToSearchFor="This account's tweets are protected."
-		xpath = '/html/body/div/div/div[3]/div/h2'
 		url = f"https://xcancel.com/{self.username}"
 		
 		try:
-			response= requests.get(url)
-			tree = html.fromstring(response.content)
-			elements = tree.xpath(xpath)
-			print(response.status_code)
-			print(elements[0].text)
-			if elements and elements[0].text == textToSearchFor:
+			result = protectedExtractor.extract_url(url)
+			self.logger.info(f"xcancel answered {result.response.status_code} after {result.bytes_read} bytes")
+			if result.response.status_code == 404:
+				# the account does not exist, a browser would not find it either
+				return NOT_FOUND
+			if result.response.status_code != 200:
+				return None
+			if result.values['h2'] == protectedText:
 				return True
 			else:
 				return False
@@ -134,7 +212,7 @@ class Twitter(Person, XPath):
 			self.logger.error("Error while getting the infos")
 			self.logger.error(e)
 
-	
+
 if __name__ == '__main__':
 	print('hello') 
 	logger.info("Hello First Test")
@@ -0,0 +1,73 @@
+'''
+	checking many accounts at once over http, kept apart from twitter.py so a
+	cron job running `check twitter` does not import selenium or the database
+'''
+from typing import NamedTuple, Optional
+from services import logSetup
+from services.html_extractor import HtmlExtractor
+from services.async_http_handler import AsyncHttpHandler
+
+
+logger = logSetup.log("Twitter","log.txt")
+
+
+protectedText = "This account's tweets are protected."
+# the protected notice is the first h2, once the timeline starts the account is public
+protectedExtractor = HtmlExtractor(tags=('h2',), stop_when=lambda tag, attrib: 'timeline-item' in attrib.get('class', ''))
+
+
+class ProtectedCheck(NamedTuple):
+	username: str
+	protected: Optional[bool] # None when the page could not be read
+	status: Optional[int]
+	error: Optional[str] = None
+
+
+class TwitterBatchChecker:
+	'''
+		resolve the protected/public status of many usernames over pooled concurrent http,
+		baseUrl can point at a local stand-in server that serves xcancel shaped pages
+	'''
+	def __init__(self, baseUrl="https://xcancel.com", concurrency=16, perHost=4, ratePerHost=2.0):
+		self.logger = logger
+		self.baseUrl = baseUrl.rstrip('/')
+		self.http = AsyncHttpHandler(concurrency=concurrency, per_host=perHost, rate_per_host=ratePerHost, logger=logger)
+
+	def parseResult(self, username, result):
+		if not result.ok:
+			return ProtectedCheck(username, None, result.status, result.error or f"status {result.status}")
+		page = protectedExtractor.extract_chunks([result.body])
+		return ProtectedCheck(username, page.values['h2'] == protectedText, result.status)
+
+	def check(self, usernames, onResult=None):
+		'''
+			Args:
+				usernames (iterable): usernames, a generator is consumed lazily
+				onResult (callable): called with every ProtectedCheck as soon as it is known
+
+			Returns:
+				list: ProtectedCheck per username in completion order
+		'''
+		urlToUsername = {}
+
+		def urls():
+			for username in usernames:
+				url = f"{self.baseUrl}/{username}"
+				urlToUsername[url] = username
+				yield url
+
+		checks = []
+		def collect(result):
+			check = self.parseResult(urlToUsername.get(result.url), result)
+			checks.append(check)
+			if onResult:
+				onResult(check)
+
+		self.http.run_batch(urls(), on_result=collect)
+		protected = sum(1 for check in checks if check.protected)
+		failed = sum(1 for check in checks if check.protected is None)
+		self.logger.info(f"checked {len(checks)} accounts, {protected} protected, {failed} failed")
+		return checks
+
+	def cancel(self):
+		self.http.cancel()
@@ -1,28 +1,107 @@
 #!/usr/bin/python3
 
 from services import sharedMethods
-from Person import *
+from person import Person
 from models import *
 
 import json
 from services import web_driver_handler
+from services.media_store import MediaStore
+from services.image_index import ImageIndex
+from services.http_handler import ValidatorCache
+from services.wait_handler import WaitHandler
+from services import metrics
 
 import time
+import statistics
 from datetime import datetime 
 from services import logSetup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 
 
 
 webdriverPath = "/home/mr124/Documents/Projects/SMIF/geckodriver"
 profilePath =  "/home/mr124/Documents/Projects/SMIF/WhatsAppProfile"
+# images stay on, the profile pictures are read once decoded
+loadProfile = "lite"
+# set to a services.profile_manager.ProfileManager(profilePath) to give every driver its own clone
+profileManager = None
 
-logger = SharedMethods.logSetup.log("whatsApp","log.txt")
+logger = sharedMethods.logSetup.log("whatsApp","log.txt")
+
+def timedStep(step):
+    # per step durations of a whatsApp cycle, recorded once metrics.enable() was called
+    return metrics.timed("smif_whatsapp_step_seconds", "seconds spent in the whatsApp scraping steps", step=step)
+
+# evaluates every profile xpath in the page and returns all the fields in one webdriver round trip
+collectUserInfoScript = """
+const xpaths = arguments[0];
+const node = (path) => document.evaluate(path, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const text = (path) => { const element = node(path); return element ? element.innerText : null; };
+const imageUrl = (path) => { const element = node(path); return element && element.tagName.toLowerCase() === 'img' ? element.src : null; };
+const businessText = 'This is a business account.';
+
+const bussinessAcc = text(xpaths.bussinessProfile) === businessText
+    || node("//*[text()='" + businessText + "']") !== null;
+const result = {bussinessAcc: bussinessAcc, smallImageUrl: imageUrl(xpaths.smallImage)};
+if (bussinessAcc) {
+    const cover = node(xpaths.bussinessCover);
+    const match = cover ? /url\\("(.*?)"\\)/.exec(cover.getAttribute('style') || '') : null;
+    result.about = text(xpaths.bussinessAbout);
+    result.bussnissAbout = text(xpaths.bussinessAboutDiv);
+    result.bigImageUrl = imageUrl(xpaths.bussinessBigImage);
+    result.bussnissCover = match ? match[1] : null;
+    result.bussinessName = text(xpaths.bussinessName);
+} else {
+    result.about = text(xpaths.about);
+    result.bigImageUrl = imageUrl(xpaths.bigImage);
+}
+return result;
+"""
+
+# keeps a MutationObserver on the chat header that buffers every online/offline transition
+# in window.__smifPresence, reinstalls it when whatsApp re-renders the header, and hands
+# over the buffered transitions, so one webdriver call drains everything since the last call
+drainPresenceScript = """
+const [headerXpath, onlineXpath] = arguments;
+const node = (path) => document.evaluate(path, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const state = window.__smifPresence = window.__smifPresence || {events: [], observer: null, target: null, online: null};
+const push = () => {
+    const status = node(onlineXpath);
+    const online = status ? status.innerText.toLowerCase().includes('online') : false;
+    if (online !== state.online) {
+        state.online = online;
+        state.events.push({t: Date.now(), online: online});
+    }
+};
+let installed = state.target !== null && state.target.isConnected;
+if (!installed) {
+    const header = node(headerXpath);
+    if (state.observer) { state.observer.disconnect(); }
+    state.observer = null;
+    state.target = header;
+    if (header) {
+        state.observer = new MutationObserver(push);
+        state.observer.observe(header, {childList: true, subtree: true, characterData: true});
+        push();
+        installed = true;
+    }
+}
+// same job as the mouse moves of isActiveNow, keeps the tab counted as active
+document.body.dispatchEvent(new MouseEvent('mousemove', {bubbles: true}));
+return {events: state.events.splice(0), online: state.online, installed: installed, now: Date.now()};
+"""
 
 class XPath():
     def __init__(self):
         # Xpath Part
         self.newChatXpath = '//*[@id="side"]/div[1]/div/div[2]/div[2]/div'
         self.searchXpath = '//*[@id="side"]/div[1]/div/div[2]/div[2]/div/div[1]/p'
+        # a search result row whose title is the number, whatsApp shows it as +966 50 000 0000
+        self.searchResultXpath = '//div[@role="listitem" or @role="row"]//span[@title][contains(translate(@title, "+- ", ""), "{}")]'
         self.smallImageXpath = '/html/body/div[1]/div/div/div[2]/div[4]/div/header/div[1]/div/img'
         self.aboutXpath = '/html/body/div[1]/div/div/div[2]/div[5]/span/div/span/div/div/section/div[2]/span/span'
         self.BigImageXpath='/html/body/div[1]/div/div/div[2]/div[5]/span/div/span/div/div/section/div[1]/div[1]/div/img' 
@@ -38,21 +117,29 @@ class XPath():
 
 
         self.contactDivXpath = '/html/body/div[1]/div/div/div[2]/div[4]/div/header'
+        self.contactInfoXpath = '/html/body/div[1]/div/div/div[2]/div[5]/span/div/span/div/div/section'
         self.myImageXpath = '/html/body/div[1]/div/div/div[2]/div[3]/header/div[1]/div/img'
         self.whatsAppUrl = "https://web.whatsapp.com"
 
 
 class WhatsApp(Person,XPath):
-    def __init__(self, phoneNumber=None, name=None, username=None):
+    def __init__(self, phoneNumber=None, name=None, username=None, presenceWriter=None, mediaStore=None):
         self.logger = logger or logSetup.setup_logger("WhatsApp", "WhatsAppLog.txt")
         self.webdriverPath = webdriverPath
         self.profilePath = profilePath
+        self.loadProfile = loadProfile
+        self.clonePath = None
         self.Xpath = XPath()
         self.person = Person(name=name,phoneNumber=phoneNumber, username=username)
         self.bussinessAcc = False # defualt value for normal ppl
         self.data = {'about':'','bussnissAbout':'', 'newAbout':'','bigImageUrl':'','smallImageUrl':'','bussnissCover':'', }
         self.session = self.createClassSession()
         self.persondb = self.loadDatabaseData()
+        self.presenceWriter = presenceWriter # buffered bulk writer for the raw online samples
+        self.lastInterval = None
+        self.mediaStore = mediaStore # created on the first big image download if not given
+        self.pHashThreshold = 10 # max perceptual hash distance still counted as the same picture
+        self.presenceMaxGap = 300
 
 
     def saveCookie(self, cookieFileName ,cookies):
@@ -65,7 +152,7 @@ class WhatsApp(Person,XPath):
             self.logger.error("erro in saving the cookie")
 
     def LoadCookeFile(self, cookieFileName):
-        if SharedMethods.BaseClass.checkIfFileExist(cookieFileName):
+        if sharedMethods.BaseClass.checkIfFileExist(cookieFileName):
             with open(cookieFileName, 'r') as cookiesFile:
                 cookies = json.load(cookiesFile)
                 self.logger.info(f"done loading cookefile {cookieFileName}")
@@ -77,7 +164,7 @@ class WhatsApp(Person,XPath):
         
     def setupWhatsAppProfile(self):
         try:
-            driver = SharedMethods.BaseClass.CreatWebDriver(self.webdriverPath, self.profilePath)
+            driver = sharedMethods.BaseClass.CreatWebDriver(self.webdriverPath, self.profilePath)
             driver.get(self.Xpath.whatsAppUrl)
             self.logger.info("Link Your Device")
             SaveCookie = input("Done Linking Save the cookie?: Y/n ")
@@ -88,7 +175,7 @@ class WhatsApp(Person,XPath):
         
     def LoadCookies(self):
         # not ready yet
-        driver = SharedMethods.BaseClass.CreatWebDriver(self.webdriverPath)
+        driver = sharedMethods.BaseClass.CreatWebDriver(self.webdriverPath)
         WhatsAppCookies = self.LoadCookeFile("WhatsAppCookies.json")
         if WhatsAppCookies:
             for cookie in WhatsAppCookies:
@@ -97,9 +184,18 @@ class WhatsApp(Person,XPath):
                 self.logger.info("done adding the cookies")
         return driver
             
-    def creatWhatssAppDriver(self, HeadLess=None):
+    def creatWhatssAppDriver(self, HeadLess=None, pool=None):
         try:
-            driver = SharedMethods.BaseClass.CreatWebDriver(self.webdriverPath, self.profilePath, HeadLess=HeadLess)
+            if pool:
+                # lease a warm driver, give it back with releaseDriver
+                self.pooledDriver = pool.acquire(self.profilePath)
+                self.driverPool = pool
+                driver = self.pooledDriver.driver
+            else:
+                # a private copy of the logged in profile, so several drivers can run at once
+                self.clonePath = profileManager.clone(self.profilePath) if profileManager else None
+                handler = web_driver_handler.WebDriverHandler(self.webdriverPath, self.clonePath or self.profilePath)
+                driver = handler.create_webdriver(headless=bool(HeadLess), load_profile=self.loadProfile)
             driver.get(self.Xpath.whatsAppUrl)
             self.logger.info("now opened whatsApp")
             self.driver = driver
@@ -110,7 +206,7 @@ class WhatsApp(Person,XPath):
         
     def creatWebDriver(self, HeadLess=None):
         try:
-            driver = SharedMethods.BaseClass.CreatWebDriver(self.webdriverPath, self.profilePath, HeadLess=HeadLess)
+            driver = sharedMethods.BaseClass.CreatWebDriver(self.webdriverPath, self.profilePath, HeadLess=HeadLess)
             self.logger.info("now opened Web driver")
             self.driver = driver
             return True
@@ -118,25 +214,46 @@ class WhatsApp(Person,XPath):
             self.logger.error("Couldn't create Driver")
             return False
 
-    
-    def checkIfElementIsLoaded(self, elementClass):
+    def releaseDriver(self):
+        try:
+            if getattr(self, 'pooledDriver', None):
+                self.driverPool.release(self.pooledDriver)
+                self.pooledDriver = None
+            else:
+                self.driver.quit()
+                if self.clonePath:
+                    profileManager.remove(self.clonePath)
+                    self.clonePath = None
+            self.driver = None
+            return True
+        except:
+            self.logger.error("Couldn't release the driver")
+            return False
+
+    def waits(self):
+        # one wait handler per driver, the step timings are shared by all of them
+        if getattr(self, 'waitHandler', None) is None or self.waitHandler.driver is not self.driver:
+            self.waitHandler = WaitHandler(self.driver, logger=self.logger)
+        return self.waitHandler
+
+    def checkIfElementIsLoaded(self, elementClass, step='elementLoaded'):
         try:
-            element = WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME,elementClass )))
+            element = self.waits().element(step, elementClass, 10, by=By.CLASS_NAME)
             if element:
                 self.logger.info("element is loaded in the page")
-                time.sleep(3)
                 return True
         except TimeoutException as e:
             self.logger.error("Time out on loading whatsApp")
         except Exception as e:
             self.logger.error(f'error {e}')
 
-    def checkIfElementIsLoadedByXpath(self, elementXpath):
+    @timedStep("checkIfElementIsLoadedByXpath")
+    def checkIfElementIsLoadedByXpath(self, elementXpath, step='elementLoaded'):
         try:
-            element = WebDriverWait(self.driver, 120).until(EC.presence_of_element_located((By.XPATH, elementXpath)))
+            # present and every image inside it decoded, instead of sleeping after it shows up
+            element = self.waits().images_loaded(step, elementXpath, 120)
             if element:
                 self.logger.info("element is loaded in the page")
-                time.sleep(3)
                 return True
         except TimeoutException as e:
             self.logger.error("Time out on loading whatsApp")
@@ -197,17 +314,36 @@ class WhatsApp(Person,XPath):
 
 
 
+    @timedStep("openContactViaUrl")
     def openContactViaUrl(self):
         try:
             self.logger.info(f'{self.Xpath.whatsAppUrl}/send?phone={self.person.phoneNumber}')
             self.driver.get(f'{self.Xpath.whatsAppUrl}/send?phone={self.person.phoneNumber}')
-            WebDriverWait(self.driver, 240).until(EC.presence_of_element_located((By.XPATH, self.Xpath.contactDivXpath)))
-            time.sleep(3)
+            self.waits().images_loaded('openContactViaUrl', self.Xpath.contactDivXpath, 240)
             return True
         except:
             self.logger.error("can't find contact")
             return False
     
+    def switchToContact(self):
+        '''
+            open the contact chat from the search box without reloading whatsApp web,
+            falls back to openContactViaUrl if the in app search fails
+        '''
+        try:
+            oldHeader = self.findElementByXpath(self.Xpath.contactDivXpath)
+            self.findElementByXpath(self.Xpath.newChatXpath).click()
+            self.findElementByXpath(self.Xpath.searchXpath).click()
+            self.sendKeys(word=self.person.phoneNumber)
+            self.sendKeys(word=Keys.ENTER)
+            if oldHeader:
+                self.waits().stale('switchToContact.leaveChat', oldHeader, 10)
+            self.waits().images_loaded('switchToContact.header', self.Xpath.contactDivXpath, 30)
+            return True
+        except:
+            self.logger.info(f"in app switch failed for {self.person.phoneNumber} using the url")
+            return self.openContactViaUrl()
+
     def searchContact(self):
         try:
             newChatElement = self.findElementByXpath(self.Xpath.newChatXpath)
@@ -215,8 +351,8 @@ class WhatsApp(Person,XPath):
             searchElement = self.findElementByXpath(self.Xpath.searchXpath)
             searchElement.click()
             self.sendKeys(word=self.person.phoneNumber)
+            self.waits().element('searchContact', self.Xpath.searchResultXpath.format(self.person.phoneNumber), 10)
             self.logger.info("done searching for contact ")
-            time.sleep(3)
             return True
         except:
             self.logger.error("can't find contact")
@@ -226,7 +362,8 @@ class WhatsApp(Person,XPath):
         try:
             smallImageElement = self.findElementByXpath(self.Xpath.smallImageXpath)
             smallImageElement.click()
-            time.sleep(2)
+            # the info panel is ready once its profile picture is decoded
+            self.waits().images_loaded('openContact', self.Xpath.contactInfoXpath, 30)
             self.logger.info("Done opening the contact chat")
             return True
         except:
@@ -362,6 +499,7 @@ class WhatsApp(Person,XPath):
                 self.logger.error("error in geting bussinessName")
 
 
+    @timedStep("collectUserInfo")
     def collectUserInfo(self):
         try:
             if self.bussinessAcc:
@@ -382,11 +520,48 @@ class WhatsApp(Person,XPath):
             self.logger.error("error while collecting all user data ")
             return False
 
+    @timedStep("collectUserInfoBatched")
+    def collectUserInfoBatched(self):
+        '''
+            same fields as checkIfBussinessProfile + collectUserInfo but all the xpaths
+            are evaluated by one execute_script call instead of a few round trips per field
+
+            Returns:
+                bool: True if the fields were collected into self.data
+        '''
+        try:
+            xpaths = {
+                'bussinessProfile': self.Xpath.bussinessProfileXpath,
+                'smallImage': self.Xpath.smallImageXpath,
+                'about': self.Xpath.aboutXpath,
+                'bigImage': self.Xpath.BigImageXpath,
+                'bussinessAbout': self.Xpath.bussinessAbout,
+                'bussinessAboutDiv': self.Xpath.bussinessAboutDiv,
+                'bussinessBigImage': self.Xpath.bussinessBigImage,
+                'bussinessCover': self.Xpath.bussinessCoverDiv,
+                'bussinessName': self.Xpath.bussinessName,
+            }
+            result = self.driver.execute_script(collectUserInfoScript, xpaths)
+            self.bussinessAcc = bool(result.pop('bussinessAcc'))
+            for key, value in result.items():
+                if key in ('smallImageUrl', 'bigImageUrl'):
+                    self.data[key] = value or False # same as getUrlFromImg when there is no image
+                elif value is not None:
+                    self.data[key] = value
+            self.logger.info(f"Done collecting all the {'bussniss ' if self.bussinessAcc else ''}user data in one call")
+            return True
+        except Exception as e:
+            self.logger.error(f"error while collecting the user data in one call {e}")
+            return False
+
     def getAlluserInfo(self):
         if self.person.name and self.person.phoneNumber:
-            contactDiv = self.checkIfElementIsLoadedByXpath(self.Xpath.contactDivXpath)
+            contactDiv = self.checkIfElementIsLoadedByXpath(self.Xpath.contactDivXpath, step='contactHeader')
             if contactDiv:
                 self.openContact()
+                if self.collectUserInfoBatched():
+                    return True
+                # fall back to one lookup per field
                 self.checkIfBussinessProfile()
                 result = self.collectUserInfo()
                 return True if result else False
@@ -397,13 +572,23 @@ class WhatsApp(Person,XPath):
             self.logger.error("can't find user name or phoneNumber")
             return False
         
+    @timedStep("downloaImage")
     def downloaImage(self, imgUrl, tempImage=False):
         try:
-            if imgUrl and self.person.name and SharedMethods.BaseClass.checkIfDir(f"Files/{self.person.name}"): # ensure that the person has dir profile
+            if imgUrl and self.person.name and sharedMethods.BaseClass.checkIfDir(f"Files/{self.person.name}"): # ensure that the person has dir profile
                 ImgName = f"Files/{self.person.name}/whatsApp/TempSmallImage" if tempImage else f'Files/{self.person.name}/whatsApp/{self.person.name}-{f"{datetime.now()}".replace(" ","-")}'
-                Img = SharedMethods.Image(imageUrl=imgUrl, imageName=ImgName)
-                if Img.DownloadImage():
-                    Img.GenerateImageHash()
+                if not tempImage:
+                    # big images go through the content addressed store, a picture we already have is not written again
+                    # and an unchanged url is a 304; ImgName is only linked by storeNewBigImage when the picture is logged
+                    if not self.mediaStore:
+                        self.mediaStore = MediaStore()
+                    stored = self.mediaStore.fetch(imgUrl, cache=ValidatorCache.default())
+                    Img = sharedMethods.Image(imageUrl=imgUrl, imageName=ImgName, imageHash=stored.digest)
+                    Img.Path = stored.blob_path
+                    Img.Size = stored.size
+                    return Img
+                Img = sharedMethods.Image(imageUrl=imgUrl, imageName=ImgName)
+                if Img.DownloadImage(cache=ValidatorCache.default()):
                     return Img
                 else:
                     self.logger.error("Error while downloading the Image")
@@ -419,7 +604,12 @@ class WhatsApp(Person,XPath):
         try:
             # fun to cmp the old with new
             if self.newSmallImage and self.oldCurrentImage:
-                if SharedMethods.Image.isTheSameImage(self.oldCurrentImage, self.newSmallImage):
+                if not self.oldCurrentImage.PHash:
+                    # no stored perceptual hash and the old temp file is overwritten by now, only md5 can tell
+                    sameImage = self.oldCurrentImage.Hash == self.newSmallImage.Hash
+                else:
+                    sameImage = self.newSmallImage.isTheSameImage(self.oldCurrentImage, self.newSmallImage, threshold=self.pHashThreshold)
+                if sameImage:
                     return False
                 else:
                     return True
@@ -456,7 +646,7 @@ class WhatsApp(Person,XPath):
                 self.storeNewBigImage()
                 return True
             else:
-                self.oldCurrentImage = SharedMethods.Image(imageName=whatsData.currentProfilePic, imageHash=whatsData.currentHash, )
+                self.oldCurrentImage = sharedMethods.Image(imageName=whatsData.currentProfilePic, imageHash=whatsData.currentHash, imagePHash=whatsData.currentPHash)
         
             if self.newSmallImage and self.oldCurrentImage:
                 self.logger.info("starting compairing the two images")
@@ -475,7 +665,7 @@ class WhatsApp(Person,XPath):
 
     def createUserFoldar(self):
         try:
-            SharedMethods.BaseClass.makeDir(f"Files/{self.person.name}/whatsApp")
+            sharedMethods.BaseClass.makeDir(f"Files/{self.person.name}/whatsApp")
             self.logger.info("Done making user whats foldar")
             return True
         except:
@@ -496,13 +686,75 @@ class WhatsApp(Person,XPath):
             self.logger.error("error in monitor active now")
             return "False"
 
+    def drainPresence(self):
+        '''
+            install the header observer if needed and take the transitions it buffered
+
+            Returns:
+                list: (datetime, bool) transitions in order, datetimes in this machine's clock
+                None: if the chat header is not in the page
+            sets pushCheckedAt to the time the buffer was drained, in the same clock
+        '''
+        try:
+            result = self.driver.execute_script(drainPresenceScript, self.Xpath.contactDivXpath, self.Xpath.onlineDivXpath)
+            if not result['installed']:
+                self.logger.error("no chat header to observe")
+                return None
+            # the browser clock can differ from ours when the driver is remote, measured once
+            # so the order of the events and the drain times never changes
+            if getattr(self, 'pushClockSkew', None) is None:
+                self.pushClockSkew = time.time() - result['now'] / 1000
+            toLocal = lambda t: datetime.fromtimestamp(t / 1000 + self.pushClockSkew)
+            self.pushCheckedAt = toLocal(result['now'])
+            return [(toLocal(event['t']), bool(event['online'])) for event in result['events']]
+        except Exception as e:
+            self.logger.error(f"error in draining the presence events {e}")
+            return None
+
+    def monitorOnlinePush(self, durationToRun, drainInterval=5):
+        '''
+            monitor the online status with the in page observer instead of polling,
+            transitions keep the time they happened at and not the time they were drained
+
+            Args:
+                durationToRun (int): seconds to keep monitoring
+                drainInterval (int): seconds between two drains, only delays the writes
+        '''
+        try:
+            startTime = time.time()
+            self.whatsData = self.getWhatsAppEntry(self.persondb.whatsappEntries)
+            self.presenceMaxGap = max(3 * drainInterval, 60)
+            lastStatus = None
+            while time.time() - startTime < durationToRun:
+                events = self.drainPresence()
+                if events is None:
+                    # the header is gone, try to open the chat again
+                    self.openContactViaUrl()
+                    lastStatus = None
+                else:
+                    for timeStamp, status in events:
+                        if lastStatus is not None and status != lastStatus:
+                            # close the previous interval at the transition
+                            self.storeActiveStatus(lastStatus, timeStamp)
+                        self.storeActiveStatus(status, timeStamp)
+                        lastStatus = status
+                    if lastStatus is not None:
+                        # nothing changed since the last event, extend the interval up to now
+                        self.storeActiveStatus(lastStatus, self.pushCheckedAt)
+                    self.logger.debug(f"drained {len(events)} presence events")
+                    self.commitSession()
+                time.sleep(drainInterval)
+        except Exception as e:
+            self.logger.error(f"error in monitoring online status with the observer {e}")
+
     def monitorOnline(self, durationToRun, frequency):
         try:
             if isinstance(durationToRun, int) and isinstance(frequency, int):
                 startTime = time.time()
                 self.whatsData = self.getWhatsAppEntry(self.persondb.whatsappEntries)
+                self.presenceMaxGap = max(3 * frequency, 60)
                 while time.time() - startTime < durationToRun:
-                    self.logger.info("checking now")
+                    self.logger.debug("checking now")
                     activeResult = self.isActiveNow()
                     self.storeActiveStatus(activeResult)
                     time.sleep(frequency)
@@ -546,7 +798,7 @@ class WhatsApp(Person,XPath):
     # database section
     def createClassSession(self):
         # Check if the database file exists
-        if not SharedMethods.BaseClass.checkIfFileExist("SMIF.db"):
+        if not sharedMethods.BaseClass.checkIfFileExist("SMIF.db"):
             self.logger.error("Database file not found")
             return False    
         # Create a session to interact with the database
@@ -618,6 +870,10 @@ class WhatsApp(Person,XPath):
     def monitorProfilePic(self):
         bigImageUrl, smallImageUrl = self.data.get('bigImageUrl'), self.data.get('smallImageUrl')
         self.newSmallImage = self.downloaImage(smallImageUrl, tempImage=True)
+        if self.newSmallImage and self.newSmallImage.NotModified:
+            # 304 for the avatar url, nothing to hash or compare
+            self.logger.info('user has the same Pic, avatar not modified')
+            return
         samePic = self.sameProfilePic()
         if samePic == False:
             if not (bigImageUrl and smallImageUrl):
@@ -645,6 +901,7 @@ class WhatsApp(Person,XPath):
         if self.newSmallImage.Hash and self.newSmallImage.FileName and whatsData:
             whatsData.currentProfilePic = self.newSmallImage.FileName
             whatsData.currentHash = self.newSmallImage.Hash
+            whatsData.currentPHash = self.newSmallImage.PHash or self.newSmallImage.GeneratePerceptualHash()
             return True
         elif self.newSmallImage == False:
             whatsData.currentProfilePic = str(False)
@@ -665,8 +922,18 @@ class WhatsApp(Person,XPath):
         if self.persondb:
             whatsData = self.getWhatsAppEntry(self.persondb.whatsappEntries)
         if self.newBigImage.Hash and self.newBigImage.FileName and whatsData:
-            bigImage = profilePicsLog(picPath=self.newBigImage.FileName, picHash=self.newBigImage.Hash)
+            if self.session.query(profilePicsLog.picId).filter_by(picHash=self.newBigImage.Hash).first():
+                # picHash is unique, the same picture is already logged; no view and no reference
+                # for it, and the blob goes if nothing else uses it
+                self.logger.info("big image is already in the profile pics log")
+                self.mediaStore.discard(self.newBigImage.Hash)
+                return True
+            self.mediaStore.link(self.newBigImage.Hash, self.newBigImage.FileName)
+            bigImage = profilePicsLog(picPath=self.newBigImage.FileName, picHash=self.newBigImage.Hash,
+                                      picPHash=self.newBigImage.PHash or self.newBigImage.GeneratePerceptualHash())
             whatsData.profilePicLog.append(bigImage)
+            if bigImage.picPHash:
+                ImageIndex.default().add(bigImage.picPHash, f"whatsApp:{whatsData.whatsappUserId}:{bigImage.picPath}")
             return True
         elif self.newBigImage == False:
             whatsData.currentProfilePic = str(False)
@@ -674,6 +941,29 @@ class WhatsApp(Person,XPath):
         else:
             return False
     
+    def findSimilarAvatars(self, radius=10):
+        '''
+            look for the new big image on any other target
+
+            Returns:
+                list: IndexMatch of the other targets within radius bits, closest first
+        '''
+        try:
+            pHash = self.newBigImage.PHash or self.newBigImage.GeneratePerceptualHash()
+            if not pHash:
+                self.logger.error("no perceptual hash for the new image")
+                return []
+            whatsData = self.getWhatsAppEntry(self.persondb.whatsappEntries) if self.persondb else None
+            ownPrefix = f"whatsApp:{whatsData.whatsappUserId}:" if whatsData else None
+            matches = [match for match in ImageIndex.default().query(pHash, radius)
+                       if not (ownPrefix and match.key.startswith(ownPrefix))]
+            if matches:
+                self.logger.info(f"new avatar of {self.person.name} seen before on {len(matches)} images")
+            return matches
+        except Exception as e:
+            self.logger.error(f"error in searching similar avatars {e}")
+            return []
+
     def addNewWhatsEntry(self):
         try:
             if not self.persondb:
@@ -690,10 +980,152 @@ class WhatsApp(Person,XPath):
         except Exception as e :
             self.logger.error(f"error during add the whats entry: {e}")
     
-    def storeActiveStatus(self, activeResult): 
-        ''' store active log to db'''
+    def commitSession(self):
+        ''' commit the pending changes of this target, timed as the db step '''
+        if self.session:
+            with metrics.timer("smif_whatsapp_step_seconds", step="dbCommit"):
+                self.session.commit()
+
+    def storeActiveStatus(self, activeResult, timeStamp=None): 
+        '''
+            store active status to db as presence intervals,
+            the raw samples are only kept when there is a presenceWriter,
+            the onlineLog rows from before the intervals are folded into them by models.migrateDatabase
+
+            Args:
+                activeResult (bool): the status
+                timeStamp (datetime): when the status was seen, defaults to now
+        '''
         if activeResult != 'False' and self.whatsData:
-            self.whatsData.onlineLog.append(onlineLog(status=activeResult))
+            timeStamp = timeStamp or datetime.now()
+            self.lastInterval = presenceInterval.recordPresence(
+                self.session, self.whatsData.whatsappUserId, activeResult, timeStamp,
+                lastInterval=self.lastInterval, maxGap=self.presenceMaxGap)
+            if self.presenceWriter:
+                self.presenceWriter.add(self.whatsData.whatsappUserId, activeResult, timeStamp.timestamp())
+
+
+class WhatsAppMonitor:
+    '''
+        monitor the online status of many targets from one whatsApp web session,
+        every target gets its own slot inside one cycle so one browser is enough
+    '''
+    def __init__(self, targets, HeadLess=None, pool=None, presenceWriter=None):
+        '''
+            Args:
+                targets (list): WhatsApp instances or dicts of WhatsApp kwargs (phoneNumber, name, username)
+                HeadLess (bool): run the shared driver headless
+                pool (WebDriverPool): lease the shared driver from this pool
+                presenceWriter (PresenceWriter): buffer the samples and bulk insert them
+        '''
+        self.logger = logger
+        self.HeadLess = HeadLess
+        self.pool = pool
+        self.targets = [target if isinstance(target, WhatsApp) else WhatsApp(**target) for target in targets]
+        if presenceWriter:
+            for target in self.targets:
+                target.presenceWriter = presenceWriter
+        # by target index, the same number can be monitored by two targets
+        self.sampleTimes = [[] for target in self.targets]
+        self.driver = None
+
+    def creatDriver(self):
+        if not self.targets:
+            self.logger.error("no targets to monitor")
+            return False
+        owner = self.targets[0]
+        if not owner.creatWhatssAppDriver(HeadLess=self.HeadLess, pool=self.pool):
+            return False
+        self.driver = owner.driver
+        for target in self.targets:
+            target.driver = self.driver
+            target.whatsData = target.getWhatsAppEntry(target.persondb.whatsappEntries) if target.persondb else None
+        return owner.checkIfElementIsLoadedByXpath(owner.Xpath.newChatXpath, step='whatsAppLoaded')
+
+    def sampleTarget(self, index):
+        target = self.targets[index]
+        if not target.switchToContact():
+            self.logger.error(f"can't open {target.person.phoneNumber} skipping this slot")
+            return False
+        activeResult = target.isActiveNow()
+        if activeResult == 'False':
+            return False
+        target.storeActiveStatus(activeResult)
+        self.sampleTimes[index].append(time.time())
+        return True
+
+    def monitorOnline(self, durationToRun, frequency):
+        '''
+            cycle all the targets through the shared driver
+
+            Args:
+                durationToRun (int): seconds to keep monitoring
+                frequency (int): seconds between two samples of the same target
+
+            Returns:
+                dict: the sampling report, see report()
+        '''
+        try:
+            if not (isinstance(durationToRun, int) and isinstance(frequency, int)):
+                self.logger.error("wtf the duration and freq is not int")
+                return False
+            if not self.driver and not self.creatDriver():
+                self.logger.error("couldn't start the shared whatsApp session")
+                return False
+
+            self.startTime = time.time()
+            slot = frequency / len(self.targets)
+            for target in self.targets:
+                target.presenceMaxGap = max(3 * frequency, 60)
+            while time.time() - self.startTime < durationToRun:
+                cycleStart = time.time()
+                for index, target in enumerate(self.targets):
+                    wait = cycleStart + index * slot - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                    self.sampleTarget(index)
+                # one commit per cycle, the samples are not lost if the run is cut short
+                self.commit()
+                cycleTime = time.time() - cycleStart
+                if cycleTime < frequency:
+                    time.sleep(frequency - cycleTime)
+                else:
+                    self.logger.info(f"cycle took {cycleTime:.2f}s longer than the {frequency}s frequency")
+            return self.report()
+        except Exception as e:
+            self.logger.error(f"error in monitoring online status {e}")
+            return False
+
+    def report(self):
+        '''
+            Returns:
+                dict: samplesPerSecond for the whole run and, in the order of the targets,
+                      phoneNumber, samples, meanInterval and jitter (stdev of the intervals) in seconds
+        '''
+        elapsed = time.time() - self.startTime
+        targets = []
+        for target, times in zip(self.targets, self.sampleTimes):
+            intervals = [b - a for a, b in zip(times, times[1:])]
+            targets.append({
+                'phoneNumber': target.person.phoneNumber,
+                'samples': len(times),
+                'meanInterval': statistics.mean(intervals) if intervals else None,
+                'jitter': statistics.pstdev(intervals) if intervals else None,
+            })
+        samples = sum(len(times) for times in self.sampleTimes)
+        result = {'samples': samples, 'elapsed': elapsed, 'samplesPerSecond': samples / elapsed if elapsed else 0, 'targets': targets}
+        self.logger.info(f"{samples} samples in {elapsed:.1f}s ({result['samplesPerSecond']:.2f}/s)")
+        return result
+
+    def commit(self):
+        ''' commit the stored samples of every target '''
+        for target in self.targets:
+            target.commitSession()
+
+    def quit(self):
+        if self.driver:
+            self.targets[0].releaseDriver()
+            self.driver = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+"""
+smif command line. Every subcommand imports only the modules it needs, so a
+cron job checking a few accounts does not pay for selenium or the database.
+
+    python run.py monitor whatsapp --phone 966500000000 --username target --duration 3600 --frequency 10
+    python run.py monitor whatsapp --phone 966500000000 --username target --duration 3600 --push
+    python run.py monitor spotify
+    python run.py check twitter user1 user2 --file usernames.txt
+    python run.py import people.csv
+    python run.py export presence --username target --since 2024-01-01 --out presence.csv
+    python run.py export people --out people.csv
+"""
+import argparse
+import contextlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "models"), os.path.join(ROOT, "services")]
+
+# person columns read by import and written by export people, phoneNumber goes to its own table
+PEOPLE_FIELDS = ("username", "name", "birthday", "country", "address", "phoneNumber")
+
+
+def openOutput(path):
+    return open(path, "w", newline="") if path else contextlib.nullcontext(sys.stdout)
+
+
+def monitorWhatsApp(args):
+    from modules.whatsApp import WhatsApp
+
+    target = WhatsApp(phoneNumber=args.phone, name=args.name, username=args.username)
+    if not target.creatWhatssAppDriver(HeadLess=args.headless):
+        return 1
+    try:
+        if not target.openContactViaUrl():
+            return 1
+        if args.push:
+            target.monitorOnlinePush(args.duration, drainInterval=args.frequency)
+        else:
+            target.monitorOnline(args.duration, args.frequency)
+        target.commitSession()
+    finally:
+        target.releaseDriver()
+    return 0
+
+
+def monitorSpotify(args):
+    from modules.spotify import SpotifyTracker
+
+    totals = SpotifyTracker(concurrency=args.concurrency).sweep()
+    print(f"{totals['fetched']} fetched, {totals['changed']} changed, {totals['failed']} failed in {totals['elapsed']:.1f}s")
+    return 0 if not totals['failed'] else 1
+
+
+def checkTwitter(args):
+    from modules.twitterBatch import TwitterBatchChecker
+
+    usernames = list(args.usernames)
+    if args.file:
+        with open(args.file) as file:
+            usernames += [line.strip() for line in file if line.strip()]
+    if not usernames:
+        print("no usernames to check", file=sys.stderr)
+        return 2
+
+    labels = {True: "protected", False: "public", None: "unknown"}
+    def show(check):
+        print(f"{check.username}\t{labels[check.protected]}" + (f"\t{check.error}" if check.error else ""))
+
+    checks = TwitterBatchChecker(concurrency=args.concurrency).check(usernames, onResult=show)
+    return 0 if all(check.protected is not None for check in checks) else 1
+
+
+def importPeople(args):
+    import csv
+    import models
+
+    session = models.openSession()
+    added = skipped = 0
+    try:
+        with open(args.file, newline="") as file:
+            for row in csv.DictReader(file):
+                if not row.get("username") or not row.get("name"):
+                    skipped += 1
+                    continue
+                person = models.Persondb(**{field: row.get(field) or None for field in PEOPLE_FIELDS[:-1]})
+                if not person.addPerson(session):
+                    skipped += 1
+                    continue
+                if row.get("phoneNumber"):
+                    person.phoneNumbers.append(models.PhoneNumbers(phoneNumber=row["phoneNumber"]))
+                if row.get("playlistUrl"):
+                    # swept by monitor spotify
+                    person.spotifyEntries.append(models.Spotify(playlistUrl=row["playlistUrl"]))
+                added += 1
+        session.commit()
+    finally:
+        session.close()
+    print(f"{added} people imported, {skipped} skipped")
+    return 0
+
+
+def exportPeople(args):
+    import csv
+    import models
+
+    session = models.openSession()
+    try:
+        with openOutput(args.out) as output:
+            writer = csv.writer(output)
+            writer.writerow(PEOPLE_FIELDS)
+            rows = session.query(models.Persondb.username, models.Persondb.name, models.Persondb.birthday,
+                                 models.Persondb.country, models.Persondb.address, models.PhoneNumbers.phoneNumber) \
+                .outerjoin(models.PhoneNumbers).order_by(models.Persondb.userId).yield_per(1000)
+            writer.writerows(rows)
+    finally:
+        session.close()
+    return 0
+
+
+def exportPresence(args):
+    import csv
+    from datetime import datetime
+    import models
+
+    since = datetime.fromisoformat(args.since) if args.since else datetime.min
+    until = datetime.fromisoformat(args.until) if args.until else datetime.now()
+    session = models.openSession()
+    try:
+        entries = session.query(models.whatsAppdb.whatsappUserId, models.whatsAppdb.phoneNumber) \
+            .join(models.Persondb).filter(models.Persondb.username == args.username).all()
+        if not entries:
+            print(f"no whatsApp entry for {args.username}", file=sys.stderr)
+            return 1
+        with openOutput(args.out) as output:
+            writer = csv.writer(output)
+            writer.writerow(("phoneNumber", "start", "end", "seconds"))
+            for whatsappUserId, phoneNumber in entries:
+                for start, end in models.presenceInterval.onlineIntervals(session, whatsappUserId, since, until):
+                    writer.writerow((phoneNumber, start.isoformat(), end.isoformat(), (end - start).total_seconds()))
+    finally:
+        session.close()
+    return 0
+
+
+def buildParser():
+    parser = argparse.ArgumentParser(prog="smif", description="Social Media Investigation Framework")
+    parser.add_argument("--metrics-port", type=int, help="serve prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", help="write prometheus metrics to this file when the command ends")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    monitor = commands.add_parser("monitor", help="keep watching a target").add_subparsers(dest="platform", required=True)
+    whatsApp = monitor.add_parser("whatsapp", help="online status of a whatsApp number")
+    whatsApp.add_argument("--phone", required=True)
+    whatsApp.add_argument("--username", required=True, help="the person the number belongs to")
+    whatsApp.add_argument("--name")
+    whatsApp.add_argument("--duration", type=int, default=3600, help="seconds to monitor")
+    whatsApp.add_argument("--frequency", type=int, default=10, help="seconds between polls, or between drains with --push")
+    whatsApp.add_argument("--push", action="store_true", help="record transitions with the in page observer instead of polling")
+    whatsApp.add_argument("--headless", action="store_true")
+    whatsApp.set_defaults(handler=monitorWhatsApp)
+    spotify = monitor.add_parser("spotify", help="one sweep over every tracked playlist")
+    spotify.add_argument("--concurrency", type=int, default=32)
+    spotify.set_defaults(handler=monitorSpotify)
+
+    check = commands.add_parser("check", help="one off lookups").add_subparsers(dest="platform", required=True)
+    twitter = check.add_parser("twitter", help="protected or public accounts")
+    twitter.add_argument("usernames", nargs="*")
+    twitter.add_argument("--file", help="one username per line")
+    twitter.add_argument("--concurrency", type=int, default=16)
+    twitter.set_defaults(handler=checkTwitter)
+
+    importCommand = commands.add_parser("import", help=f"add people from a csv with the columns {', '.join(PEOPLE_FIELDS)} and an optional playlistUrl")
+    importCommand.add_argument("file")
+    importCommand.set_defaults(handler=importPeople)
+
+    export = commands.add_parser("export", help="write stored data as csv").add_subparsers(dest="what", required=True)
+    people = export.add_parser("people")
+    people.add_argument("--out", help="defaults to stdout")
+    people.set_defaults(handler=exportPeople)
+    presence = export.add_parser("presence", help="online intervals of a person")
+    presence.add_argument("--username", required=True)
+    presence.add_argument("--since", help="ISO date or datetime")
+    presence.add_argument("--until", help="ISO date or datetime, defaults to now")
+    presence.add_argument("--out", help="defaults to stdout")
+    presence.set_defaults(handler=exportPresence)
+    return parser
+
+
+def main(argv=None):
+    args = buildParser().parse_args(argv)
+    if not (args.metrics_port or args.metrics_file):
+        return args.handler(args)
+
+    from services import metrics
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+    metrics.enable()
+    try:
+        return args.handler(args)
+    finally:
+        if args.metrics_file:
+            metrics.write_textfile(args.metrics_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
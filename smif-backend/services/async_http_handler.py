@@ -0,0 +1,200 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from services import logSetup
+
+
+class FetchResult(NamedTuple):
+    """
+    The outcome of one URL of a batch. error is set instead of raising.
+    """
+    url: str
+    status: Optional[int]
+    body: Optional[bytes]
+    headers: Dict[str, str]
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and 200 <= self.status < 300
+
+
+class HostRateLimiter:
+    """
+    Spaces the requests to each host so none gets more than rate per second.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next: Dict[str, float] = {}
+
+    async def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # reserve the next free slot before sleeping, the event loop runs one coroutine at a time
+        slot = max(now, self._next.get(host, now))
+        self._next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncHttpHandler:
+    """
+    Asyncio counterpart of HttpHandler for high fan-out lookups: many URLs in
+    flight at once, bounded overall and per host, with retries on 429/5xx and
+    cancellation. run_batch() lets the synchronous modules use it.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 64,
+        per_host: int = 8,
+        timeout: float = 10,
+        retries: int = 2,
+        backoff_factor: float = 0.5,
+        headers: Optional[Dict[str, str]] = None,
+        rate_per_host: Optional[float] = None,
+        logger=None,
+    ):
+        """
+        Initializes the handler.
+
+        Args:
+            concurrency (int): Requests in flight across all hosts.
+            per_host (int): Requests in flight to a single host.
+            timeout (float): Total timeout of one request in seconds.
+            retries (int): Retries for connection errors, timeouts, 429 and 5xx.
+            backoff_factor (float): Base delay in seconds, doubled on every retry.
+            headers (Optional[Dict[str, str]]): Headers sent with every request.
+            rate_per_host (Optional[float]): Requests per second allowed to a single host, retries included.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.headers = headers or {}
+        self.rate_per_host = rate_per_host
+        self._rate_limiter: Optional[HostRateLimiter] = None
+        self.logger = logger or logSetup.setup_logger("AsyncHttpHandler", "log.txt")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+        self._cancelled = threading.Event()
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> FetchResult:
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            if self._rate_limiter:
+                await self._rate_limiter.wait(url)
+            try:
+                async with session.get(url) as response:
+                    if response.status in (429, 500, 502, 503, 504) and attempt < self.retries:
+                        retry_after = response.headers.get("Retry-After", "")
+                        delay = float(retry_after) if retry_after.isdigit() else None
+                    else:
+                        body = await response.read()
+                        return FetchResult(url, response.status, body, dict(response.headers), time.perf_counter() - started)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    return FetchResult(url, None, None, {}, time.perf_counter() - started, repr(e))
+                delay = None
+            await asyncio.sleep(delay if delay is not None else random.uniform(0, self.backoff_factor * (2 ** attempt)))
+            attempt += 1
+
+    async def fetch_all(self, urls: Iterable[str]) -> AsyncIterator[FetchResult]:
+        """
+        Fetches the URLs and yields the results in completion order.
+        URLs are pulled lazily, so a long iterable is never all in flight at once.
+        """
+        self._cancelled.clear()
+        self._loop = asyncio.get_running_loop()
+        self._rate_limiter = HostRateLimiter(self.rate_per_host) if self.rate_per_host else None
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        results: asyncio.Queue = asyncio.Queue()
+        pending = iter(urls)
+        done = object()
+
+        async def worker(session):
+            try:
+                for url in pending:
+                    await results.put(await self._fetch(session, url))
+            finally:
+                await results.put(done)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers) as session:
+            self._workers = [asyncio.create_task(worker(session)) for _ in range(self.concurrency)]
+            running = len(self._workers)
+            try:
+                while running:
+                    result = await results.get()
+                    if result is done:
+                        running -= 1
+                    else:
+                        yield result
+            finally:
+                for task in self._workers:
+                    task.cancel()
+                await asyncio.gather(*self._workers, return_exceptions=True)
+                self._workers = []
+
+    def cancel(self) -> None:
+        """
+        Stops a running batch from any thread; results already yielded are kept.
+        """
+        self._cancelled.set()
+        loop = self._loop
+        if loop and not loop.is_closed():
+            for task in list(self._workers):
+                loop.call_soon_threadsafe(task.cancel)
+
+    async def _collect(self, urls: Iterable[str], on_result: Optional[Callable]) -> List[FetchResult]:
+        collected = []
+        try:
+            async for result in self.fetch_all(urls):
+                collected.append(result)
+                if on_result:
+                    on_result(result)
+        except asyncio.CancelledError:
+            pass
+        if self._cancelled.is_set():
+            self.logger.info(f"Batch cancelled after {len(collected)} results")
+        return collected
+
+    def run_batch(self, urls: Iterable[str], on_result: Optional[Callable] = None) -> List[FetchResult]:
+        """
+        Synchronous wrapper for the modules: fetches a batch and returns it in completion order.
+        Called from a running event loop it runs the batch on a worker thread and blocks that
+        loop until it is done; async code should iterate fetch_all instead.
+
+        Args:
+            urls (Iterable[str]): The URLs to fetch.
+            on_result (Optional[Callable]): Called with every FetchResult as soon as it completes.
+
+        Returns:
+            List[FetchResult]: One result per URL unless the batch was cancelled.
+        """
+        started = time.perf_counter()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            results = asyncio.run(self._collect(urls, on_result))
+        else:
+            # asyncio.run cannot start inside a running loop, the batch gets its own on a worker thread
+            self.logger.warning("run_batch called from a running event loop, iterate fetch_all to not block it")
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                results = executor.submit(asyncio.run, self._collect(urls, on_result)).result()
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"Fetched {len(results)} urls in {elapsed:.2f}s")
+        return results
@@ -1,4 +1,4 @@
-import logSetup
+from services import logSetup
 import os
 import subprocess
 import requests
@@ -9,7 +9,26 @@ from selenium.webdriver.firefox.webdriver import WebDriver
 
 import json
 
+from services.file_handler import FileHandler
+
 logger = logSetup.log("BaseClass","log.txt")
 
 class BaseClass:
-    pass
+    # the old helper names the modules still call, the work is done by the handlers
+
+    @staticmethod
+    def checkIfFileExist(path):
+        return FileHandler.check_if_file_exist(path)
+
+    @staticmethod
+    def checkIfDir(path):
+        return FileHandler.check_if_dir(path)
+
+    @staticmethod
+    def makeDir(path):
+        return FileHandler.make_dir(path)
+
+    @staticmethod
+    def CreatWebDriver(webdriverPath, profilePath=None, HeadLess=None, loadProfile=None):
+        from services.web_driver_handler import WebDriverHandler
+        return WebDriverHandler(webdriverPath, profilePath).create_webdriver(headless=bool(HeadLess), load_profile=loadProfile)
@@ -1,6 +1,6 @@
 import subprocess
 from typing import Tuple
-import logSetup
+from services import logSetup
 
 import shutil # built into python and requires no external dependencies - cross-platform 
 
@@ -1,5 +1,5 @@
 import os
-import logSetup
+from services import logSetup
 
 logger = logSetup.setup_logger("FileHandler", "fileHandlerLog.txt")
 
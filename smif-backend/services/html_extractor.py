@@ -0,0 +1,157 @@
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Sequence
+
+import requests
+from lxml import etree
+
+from services import logSetup
+from services.http_handler import HttpClient
+
+logger = logSetup.setup_logger("HtmlExtractor", "log.txt")
+
+
+class ExtractResult(NamedTuple):
+    """
+    What was found before the extractor stopped reading.
+    """
+    values: Dict[str, Optional[str]]
+    bytes_read: int
+    complete: bool
+    response: Optional[requests.Response] = None
+
+
+class HtmlExtractor:
+    """
+    Pulls a few values out of an HTML page while it is still downloading and
+    stops reading as soon as they are found, instead of parsing the whole page.
+
+    Values are keyed by what was asked for:
+        meta:        the content of <meta name=...> or <meta property=...> in the head
+        meta_index:  "meta[n]", the content of the n-th head meta (1-based, like the xpath)
+        tags:        the text of the first element with that tag
+    """
+
+    def __init__(
+        self,
+        meta: Sequence[str] = (),
+        meta_index: Sequence[int] = (),
+        tags: Sequence[str] = (),
+        stop_when: Optional[Callable[[str, dict], bool]] = None,
+    ):
+        """
+        Initializes the extractor.
+
+        Args:
+            meta (Sequence[str]): Names or properties of head meta tags.
+            meta_index (Sequence[int]): 1-based positions of head meta tags.
+            tags (Sequence[str]): Tag names whose first text is wanted.
+            stop_when (Optional[Callable[[str, dict], bool]]): Called with the tag and attributes of every
+                start tag, returning True stops reading, e.g. once the part of the page that could hold
+                the values has passed.
+        """
+        self.meta = tuple(meta)
+        self.meta_index = tuple(meta_index)
+        self.tags = tuple(tags)
+        self.stop_when = stop_when
+
+    def _wanted(self) -> Dict[str, Optional[str]]:
+        wanted = {name: None for name in self.meta}
+        wanted.update({f"meta[{index}]": None for index in self.meta_index})
+        wanted.update({tag: None for tag in self.tags})
+        return wanted
+
+    def extract_chunks(self, chunks: Iterable[bytes]) -> ExtractResult:
+        """
+        Feeds chunks to an incremental parser until every value is found.
+
+        Args:
+            chunks (Iterable[bytes]): The page body, e.g. response.iter_content().
+
+        Returns:
+            ExtractResult: complete is True if every value was found.
+        """
+        values = self._wanted()
+        missing = set(values)
+        head_done = not (self.meta or self.meta_index)
+        meta_count = 0
+        bytes_read = 0
+        parser = etree.HTMLPullParser(events=("start", "end"))
+        stopped = False
+        inside_wanted = 0
+
+        for chunk in chunks:
+            bytes_read += len(chunk)
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                tag = element.tag if isinstance(element.tag, str) else ""
+                if event == "start":
+                    if self.stop_when and self.stop_when(tag, element.attrib):
+                        stopped = True
+                        break
+                    if tag == "meta" and not head_done:
+                        meta_count += 1
+                        content = element.get("content")
+                        key = f"meta[{meta_count}]"
+                        if key in missing:
+                            values[key] = content
+                            missing.discard(key)
+                        for name in (element.get("name"), element.get("property")):
+                            if name in missing:
+                                values[name] = content
+                                missing.discard(name)
+                    elif tag == "body":
+                        head_done = True
+                    if tag in missing and tag in self.tags:
+                        inside_wanted += 1
+                elif event == "end":
+                    if tag in missing and tag in self.tags:
+                        inside_wanted -= 1
+                        values[tag] = "".join(element.itertext()).strip()
+                        missing.discard(tag)
+                    elif tag == "head":
+                        head_done = True
+                    if not inside_wanted and tag not in ("html", "head", "body"):
+                        # nothing is read back from finished elements, keep the tree small
+                        element.clear()
+
+                if head_done:
+                    # head values can no longer show up
+                    missing -= {name for name in self.meta} | {f"meta[{index}]" for index in self.meta_index}
+                if not missing:
+                    stopped = True
+                    break
+            if stopped:
+                break
+
+        complete = all(value is not None for value in values.values())
+        return ExtractResult(values, bytes_read, complete)
+
+    def extract_url(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        chunk_size: int = 16 * 1024,
+        timeout: int = 10,
+    ) -> ExtractResult:
+        """
+        Streams a page into the parser and closes the connection once the values are found.
+
+        Returns:
+            ExtractResult: With the response, whose body is not available. On a non 200
+                           response nothing is read and values are all None.
+
+        Raises:
+            RuntimeError: If the request fails.
+        """
+        try:
+            response = HttpClient.default().request("GET", url, headers=headers, stream=True, timeout=timeout)
+        except requests.RequestException as e:
+            raise RuntimeError(f"HTTP request failed: {str(e)}")
+        try:
+            if response.status_code != 200:
+                return ExtractResult(self._wanted(), 0, False, response)
+            result = self.extract_chunks(response.iter_content(chunk_size=chunk_size))
+            logger.debug(f"Read {result.bytes_read} bytes of {url}")
+            return result._replace(response=response)
+        finally:
+            # stops the download if the values were found before the end of the page
+            response.close()
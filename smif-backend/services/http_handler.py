@@ -1,5 +1,151 @@
 import requests
-from typing import Dict, Any, Optional
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Any, Iterable, List, Optional, NamedTuple
+from services import metrics
+
+
+class HttpClient:
+    """
+    Shared HTTP client with keep-alive connection pools and retries.
+
+    Every thread gets its own requests.Session (sessions keep cookies and are not
+    thread safe) but all of them mount the same HTTPAdapter, so the per host
+    connection pools, and the open connections in them, are shared by the process.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        pool_connections: int = 32,
+        pool_maxsize: int = 16,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30.0,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+        retry_methods: Iterable[str] = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE"),
+    ):
+        """
+        Initializes the client.
+
+        Args:
+            pool_connections (int): Number of hosts to keep a connection pool for.
+            pool_maxsize (int): Connections kept open per host.
+            retries (int): Retries after the first attempt for retryable failures.
+            backoff_factor (float): Base delay in seconds, doubled on every retry.
+            backoff_max (float): Upper bound of a single delay.
+            retry_statuses (Iterable[int]): Status codes that are retried.
+            retry_methods (Iterable[str]): Methods that are safe to retry.
+        """
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_methods = frozenset(method.upper() for method in retry_methods)
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self._timing_hooks: List[Callable] = []
+        self._local = threading.local()
+
+    @classmethod
+    def default(cls) -> "HttpClient":
+        """
+        The process wide client.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+                # does nothing until metrics.enable()
+                cls._default.add_timing_hook(metrics.observe_http)
+            return cls._default
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        The session of the current thread, mounted on the shared adapter.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
+
+    def add_timing_hook(self, hook: Callable) -> None:
+        """
+        Registers hook(method, url, status, elapsed, attempt), called after every attempt.
+        status is None when the attempt raised.
+        """
+        self._timing_hooks.append(hook)
+
+    def remove_timing_hook(self, hook: Callable) -> None:
+        self._timing_hooks.remove(hook)
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    return min(max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        # full jitter, spreads the retries of many workers hitting the same host
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request, retrying connection errors, timeouts and retryable statuses.
+
+        Args:
+            method (str): HTTP method.
+            url (str): The URL.
+            **kwargs: Passed to requests.Session.request, e.g. headers, params, timeout, stream.
+
+        Returns:
+            requests.Response: The last response. A retryable status is returned once the retries are used up.
+
+        Raises:
+            requests.RequestException: If the last attempt raised.
+        """
+        kwargs.setdefault("timeout", 10)
+        retryable = method.upper() in self.retry_methods
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._emit(method, url, None, time.perf_counter() - started, attempt)
+                if not retryable or attempt >= self.retries:
+                    raise
+                time.sleep(self._backoff(attempt, None))
+                attempt += 1
+                continue
+
+            self._emit(method, url, response.status_code, time.perf_counter() - started, attempt)
+            if not (retryable and response.status_code in self.retry_statuses and attempt < self.retries):
+                return response
+            delay = self._backoff(attempt, response)
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _emit(self, method: str, url: str, status: Optional[int], elapsed: float, attempt: int) -> None:
+        for hook in self._timing_hooks:
+            try:
+                hook(method, url, status, elapsed, attempt)
+            except Exception:
+                pass
 
 class HttpHandler:
     """
@@ -16,7 +162,8 @@ class HttpHandler:
         timeout: int = 10,
     ) -> requests.Response:
         """
-        Makes an HTTP request using the specified method.
+        Makes an HTTP request using the specified method, over the shared
+        pooled HttpClient so connections are reused and failures retried.
 
         Args:
             method (str): HTTP method (GET, POST, etc.).
@@ -30,7 +177,7 @@ class HttpHandler:
             requests.Response: The response object from the HTTP request.
         """
         try:
-            response = requests.request(
+            response = HttpClient.default().request(
                 method=method,
                 url=url,
                 headers=headers,
@@ -57,4 +204,154 @@ class HttpHandler:
             return True
         return False
 
-    
+
+class CacheEntry(NamedTuple):
+    """
+    Validators of a URL and what the caller derived from its body.
+    """
+    etag: Optional[str]
+    last_modified: Optional[str]
+    size: int
+    payload: Any
+
+
+class ConditionalResponse(NamedTuple):
+    """
+    The outcome of a conditional GET. On a 304 the entry holds the payload of the last 200.
+    """
+    response: requests.Response
+    not_modified: bool
+    entry: Optional[CacheEntry]
+
+
+class ValidatorCache:
+    """
+    Remembers ETag and Last-Modified per URL and sends them back as
+    If-None-Match and If-Modified-Since, so an unchanged resource costs a 304
+    instead of a download and whatever work is done on its body.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 100000):
+        """
+        Initializes the cache.
+
+        Args:
+            path (Optional[str]): JSON file the entries are loaded from and saved to. None keeps them in memory.
+            max_entries (int): Oldest entries are dropped beyond this.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+        if path and os.path.isfile(path):
+            with open(path, "r") as file:
+                self._entries = {url: CacheEntry(*entry) for url, entry in json.load(file).items()}
+
+    @classmethod
+    def default(cls) -> "ValidatorCache":
+        """
+        The process wide cache, saved to Files/.cache/http_validators.json at exit.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls("Files/.cache/http_validators.json")
+                atexit.register(cls._default.save)
+            return cls._default
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        return self._entries.get(url)
+
+    def request_headers(self, url: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        The headers plus the validators stored for the URL.
+        """
+        headers = dict(headers or {})
+        entry = self._entries.get(url)
+        if entry:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def record(self, url: str, response: requests.Response) -> Optional[CacheEntry]:
+        """
+        Counts a response to a request made with request_headers().
+
+        Returns:
+            Optional[CacheEntry]: The cached entry if the response is a 304.
+        """
+        entry = self._entries.get(url)
+        with self._lock:
+            if response.status_code == 304 and entry:
+                self.hits += 1
+                self.bytes_saved += entry.size
+                return entry
+            self.misses += 1
+        return None
+
+    def update(self, url: str, response: requests.Response, payload: Any = None, size: Optional[int] = None) -> None:
+        """
+        Stores the validators of a 200 response with the payload the caller derived from it.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The 200 response.
+            payload (Any): JSON serializable value returned on later 304s, e.g. a digest or a parsed number.
+            size (Optional[int]): Body size, defaults to Content-Length.
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return
+        if size is None:
+            size = int(response.headers.get("Content-Length") or 0)
+        with self._lock:
+            self._entries.pop(url, None)
+            self._entries[url] = CacheEntry(etag, last_modified, size, payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+
+    def conditional_get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: int = 10,
+    ) -> ConditionalResponse:
+        """
+        GETs a URL with its stored validators.
+
+        Returns:
+            ConditionalResponse: not_modified is True on a 304, then the entry holds the last payload.
+                                 On a 200 call update() with the payload to cache.
+        """
+        response = HttpHandler.make_request("GET", url, headers=self.request_headers(url, headers), timeout=timeout)
+        entry = self.record(url, response)
+        return ConditionalResponse(response, entry is not None, entry)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: hits, misses, bytes_saved and the number of entries.
+        """
+        return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved, "entries": len(self._entries)}
+
+    def save(self) -> None:
+        """
+        Writes the entries to the cache file, if there is one.
+        """
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with self._lock:
+            entries = {url: list(entry) for url, entry in self._entries.items()}
+        with open(temp_path, "w") as file:
+            json.dump(entries, file)
+        os.replace(temp_path, self.path)
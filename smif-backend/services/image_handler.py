@@ -1,9 +1,24 @@
 import requests
 import os
-import logSetup
+import hashlib
+import tempfile
+from typing import NamedTuple
+from services import logSetup
+from services.http_handler import HttpClient
+from services import metrics
 
 logger = logSetup.log("ImageHandler", "log.txt")
 
+class DownloadResult(NamedTuple):
+    """
+    The outcome of a streamed download.
+    """
+    path: str
+    size: int
+    digest: str
+    not_modified: bool = False
+
+
 class ImageHandler:
     """
     A class to handle image-related operations such as downloading and writing.
@@ -41,17 +56,81 @@ class ImageHandler:
         Raises:
             RuntimeError: If the image cannot be downloaded or saved.
         """
+        if not file_name:
+            raise RuntimeError(f"Failed to download image from {url}")
+        ImageHandler.stream_download(file_name, url)
+
+    @staticmethod
+    @metrics.timed("smif_image_download_seconds", "streamed image downloads, 304s included")
+    def stream_download(
+        file_name: str,
+        url: str,
+        chunk_size: int = 64 * 1024,
+        hash_name: str = "md5",
+        timeout: int = 10,
+        cache=None,
+    ) -> DownloadResult:
+        """
+        Downloads an image in chunks, hashing each chunk as it is written to a
+        temporary file that is then renamed into place. The body is never held
+        in memory and the file is never read back to hash it.
+
+        Args:
+            file_name (str): The name of the file to save the image to.
+            url (str): The URL of the image.
+            chunk_size (int): Bytes read from the response per chunk.
+            hash_name (str): hashlib algorithm for the digest. md5 matches the stored hashes.
+            timeout (int): Request timeout in seconds.
+            cache (Optional[ValidatorCache]): Send the stored validators of the URL. On a 304 nothing
+                is written and the result of the last download is returned with not_modified set.
+
+        Returns:
+            DownloadResult: The final path, the size in bytes and the hex digest.
+
+        Raises:
+            RuntimeError: If the image cannot be downloaded or saved.
+        """
+        directory = os.path.dirname(os.path.abspath(file_name))
+        hasher = hashlib.new(hash_name)
+        size = 0
+        # same directory as the target so the rename stays atomic
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".download-")
         try:
-            logger.info(f"Starting to download {file_name} from {url}")
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200 and file_name:
-                image_data = response.content
-                ImageHandler.write_image(file_name, image_data)
-                logger.info(f"Successfully downloaded and saved image: {file_name}")
-            else:
-                logger.error(f"Failed to download image. URL: {url}, Status Code: {response.status_code}")
-                raise RuntimeError(f"Failed to download image from {url}")
-        except requests.RequestException as e:
+            logger.info(f"Starting to stream {file_name} from {url}")
+            headers = cache.request_headers(url) if cache else None
+            with HttpClient.default().request("GET", url, stream=True, timeout=timeout, headers=headers) as response:
+                cached = cache.record(url, response) if cache else None
+                if cached:
+                    ImageHandler._discard(fd, temp_path)
+                    logger.info(f"{url} not modified since the last download")
+                    metrics.counter("smif_image_not_modified_total", "downloads answered by a 304").inc()
+                    return DownloadResult(cached.payload["path"], cached.size, cached.payload["digest"], True)
+                if response.status_code != 200:
+                    logger.error(f"Failed to download image. URL: {url}, Status Code: {response.status_code}")
+                    raise RuntimeError(f"Failed to download image from {url}")
+                with os.fdopen(fd, "wb") as file:
+                    fd = None
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        hasher.update(chunk)
+                        file.write(chunk)
+                        size += len(chunk)
+            os.replace(temp_path, file_name)
+            if cache:
+                cache.update(url, response, payload={"path": file_name, "digest": hasher.hexdigest()}, size=size)
+        except (requests.RequestException, OSError) as e:
             logger.error(f"Error during image download: {str(e)}")
+            ImageHandler._discard(fd, temp_path)
             raise RuntimeError(f"Image download failed for URL: {url}") from e
+        except BaseException:
+            ImageHandler._discard(fd, temp_path)
+            raise
+        metrics.counter("smif_image_download_bytes_total", "bytes of images streamed to disk").inc(size)
+        logger.info(f"Successfully streamed {size} bytes to {file_name}")
+        return DownloadResult(file_name, size, hasher.hexdigest())
+
+    @staticmethod
+    def _discard(fd, temp_path: str) -> None:
+        if fd is not None:
+            os.close(fd)
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
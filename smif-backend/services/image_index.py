@@ -0,0 +1,196 @@
+import os
+import threading
+from itertools import combinations
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import models
+from services import logSetup
+from services.perceptual_hash import PerceptualHash
+
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+class IndexMatch(NamedTuple):
+    """
+    A stored image within the searched radius.
+    """
+    key: str
+    phash: int
+    distance: int
+
+
+def _flip_masks(bits: int) -> List[int]:
+    # every CHUNK_BITS wide mask with at most `bits` bits set
+    masks = [0]
+    for count in range(1, bits + 1):
+        for positions in combinations(range(CHUNK_BITS), count):
+            mask = 0
+            for position in positions:
+                mask |= 1 << position
+            masks.append(mask)
+    return masks
+
+
+class ImageIndex:
+    """
+    Near duplicate search over 64 bit perceptual hashes using multi-index hashing.
+    Each hash is split into 4 chunks of 16 bits with one table per chunk. Two hashes
+    within r bits of each other share at least one chunk within r // 4 bits, so a
+    query only probes the few table buckets around its own chunks and checks those.
+
+    The index is an append only file of "hash key" lines, loaded on first use.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path: str = "Files/.index/phash.idx", logger=None):
+        """
+        Initializes the index, nothing is read until the first add or query.
+
+        Args:
+            path (str): The index file.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.path = path
+        self.logger = logger or logSetup.setup_logger("ImageIndex", "log.txt")
+        self._hashes: List[int] = []
+        self._keys: List[str] = []
+        self._known = set()
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(CHUNKS)]
+        self._masks: Dict[int, List[int]] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def default(cls) -> "ImageIndex":
+        """
+        The process wide index at the default path.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._hashes)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.isfile(self.path):
+                with open(self.path, "r") as file:
+                    for line in file:
+                        value, _, key = line.rstrip("\n").partition(" ")
+                        if value:
+                            self._insert(int(value, 16), key)
+                self.logger.info(f"Loaded {len(self._hashes)} image hashes from {self.path}")
+            self._loaded = True
+
+    def _insert(self, phash: int, key: str) -> bool:
+        if (phash, key) in self._known:
+            return False
+        self._known.add((phash, key))
+        item = len(self._hashes)
+        self._hashes.append(phash)
+        self._keys.append(key)
+        for chunk, table in enumerate(self._tables):
+            table.setdefault((phash >> (chunk * CHUNK_BITS)) & CHUNK_MASK, []).append(item)
+        return True
+
+    def add(self, phash, key: str) -> bool:
+        """
+        Adds one image and appends it to the index file.
+
+        Args:
+            phash (Union[int, str]): The 64 bit pHash, as an int or hex string.
+            key (str): What the hash belongs to, e.g. "whatsApp:<whatsappUserId>:<path>".
+
+        Returns:
+            bool: False if the same hash and key were already indexed.
+        """
+        return self.add_many([(phash, key)]) == 1
+
+    def add_many(self, items) -> int:
+        """
+        Adds (phash, key) pairs with a single append to the index file.
+
+        Returns:
+            int: The number of new entries.
+        """
+        self._ensure_loaded()
+        lines = []
+        with self._lock:
+            for phash, key in items:
+                phash = int(phash, 16) if isinstance(phash, str) else phash
+                if self._insert(phash, key):
+                    lines.append(f"{PerceptualHash.to_hex(phash)} {key}\n")
+            if lines:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a") as file:
+                    file.writelines(lines)
+        return len(lines)
+
+    def query(self, phash, radius: int = 10, limit: Optional[int] = None) -> List[IndexMatch]:
+        """
+        Finds every indexed image within radius bits of phash.
+
+        Args:
+            phash (Union[int, str]): The 64 bit pHash, as an int or hex string.
+            radius (int): Max hamming distance.
+            limit (Optional[int]): Return only the closest matches.
+
+        Returns:
+            List[IndexMatch]: Matches ordered by distance.
+        """
+        self._ensure_loaded()
+        phash = int(phash, 16) if isinstance(phash, str) else phash
+        masks = self._masks.get(radius // CHUNKS)
+        if masks is None:
+            masks = self._masks[radius // CHUNKS] = _flip_masks(radius // CHUNKS)
+
+        candidates = set()
+        with self._lock:
+            for chunk, table in enumerate(self._tables):
+                value = (phash >> (chunk * CHUNK_BITS)) & CHUNK_MASK
+                for mask in masks:
+                    bucket = table.get(value ^ mask)
+                    if bucket:
+                        candidates.update(bucket)
+            hashes, keys = self._hashes, self._keys
+            matches = []
+            for item in candidates:
+                distance = bin(phash ^ hashes[item]).count("1")
+                if distance <= radius:
+                    matches.append(IndexMatch(keys[item], hashes[item], distance))
+        matches.sort(key=lambda match: match.distance)
+        return matches[:limit] if limit else matches
+
+    def rebuild_from_database(self, session=None) -> int:
+        """
+        Indexes every profilePicsLog row with a picPHash. Rows without one are
+        hashed from their file and the hash is saved back.
+
+        Returns:
+            int: The number of new entries.
+        """
+        session = session or models.createSession()
+        items: List[Tuple[int, str]] = []
+        for pic in session.query(models.profilePicsLog).yield_per(1000):
+            if not pic.picPHash and pic.picPath and os.path.isfile(pic.picPath):
+                try:
+                    pic.picPHash = PerceptualHash.to_hex(PerceptualHash.phash(pic.picPath))
+                except Exception as e:
+                    self.logger.error(f"can't hash {pic.picPath}: {e}")
+            if pic.picPHash:
+                items.append((pic.picPHash, f"whatsApp:{pic.whatsappUserId}:{pic.picPath}"))
+        session.commit()
+        added = self.add_many(items)
+        self.logger.info(f"Indexed {added} new images from the database")
+        return added
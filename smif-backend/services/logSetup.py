@@ -1,10 +1,216 @@
+import atexit
+import json
 import logging
-from typing import Optional
+import logging.handlers
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# backend settings, change them with configure_logging() before the first logger is set up
+_config = {
+    "json_lines": False,
+    "rotation": None,               # None, "size" or "time"
+    "max_bytes": 10 * 1024 * 1024,
+    "backup_count": 5,
+    "when": "midnight",
+    "rate": 1.0,                    # repeats of one message per second per logger once the burst is used
+    "burst": 20,
+    "console": True,
+}
+
+_queue = queue.SimpleQueue()
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+_atexit_registered = False
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per record, for log shippers and jq.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger and call site: a message repeated in a hot loop gets
+    through at most `rate` times a second after a burst, and the next one that
+    passes says how many were dropped. Warnings and errors always pass.
+
+    The modules log f-strings, so the text differs for every URL or file name;
+    the call site is what stays the same for one message template. Buckets are
+    kept least recently used first: the ones idle long enough to have refilled
+    are no different from a new bucket and are dropped, and at most max_buckets are kept.
+    """
+
+    def __init__(self, rate: float, burst: int, max_buckets: int = 1024):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rate:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        refill_time = self.burst / self.rate
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # tokens, last refill, dropped since the last one that passed
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            else:
+                self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            while len(self._buckets) > 1:
+                _, oldest = next(iter(self._buckets.items()))
+                if len(self._buckets) <= self.max_buckets and now - oldest[1] < refill_time:
+                    break
+                self._buckets.popitem(last=False)
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            dropped, bucket[2] = bucket[2], 0
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+        return True
+
+
+class _RoutingHandler(logging.Handler):
+    """
+    Runs on the listener thread: writes every record to the file its logger was set up with
+    and to the console, opening the file handlers on first use.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._files: Dict[str, logging.Handler] = {}
+        self._console: Optional[logging.Handler] = None
+
+    def _formatter(self) -> logging.Formatter:
+        return JsonLinesFormatter() if _config["json_lines"] else logging.Formatter(LOG_FORMAT)
+
+    def _file_handler(self, log_file: str) -> logging.Handler:
+        handler = self._files.get(log_file)
+        if handler is None:
+            if _config["rotation"] == "size":
+                handler = logging.handlers.RotatingFileHandler(
+                    log_file, maxBytes=_config["max_bytes"], backupCount=_config["backup_count"], delay=True)
+            elif _config["rotation"] == "time":
+                handler = logging.handlers.TimedRotatingFileHandler(
+                    log_file, when=_config["when"], backupCount=_config["backup_count"], delay=True)
+            else:
+                handler = logging.FileHandler(log_file, delay=True)
+            handler.setFormatter(self._formatter())
+            self._files[log_file] = handler
+        return handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        log_file = getattr(record, "log_file", None)
+        if log_file:
+            self._file_handler(log_file).handle(record)
+        if _config["console"]:
+            if self._console is None:
+                self._console = logging.StreamHandler()
+                self._console.setFormatter(logging.Formatter(LOG_FORMAT))
+            self._console.handle(record)
+
+    def close(self) -> None:
+        for handler in list(self._files.values()) + ([self._console] if self._console else []):
+            handler.close()
+        self._files.clear()
+        super().close()
+
+
+class _FileQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts the record on the shared queue tagged with the file of its logger; never blocks.
+    """
+
+    def __init__(self, log_file: Optional[str]):
+        super().__init__(_queue)
+        self.log_file = log_file
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if _listener is None:
+            _start_listener()
+        super().enqueue(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_file = self.log_file
+        return record
+
+
+def _start_listener() -> None:
+    global _listener, _atexit_registered
+    with _listener_lock:
+        if _listener is None:
+            _listener = logging.handlers.QueueListener(_queue, _RoutingHandler())
+            _listener.start()
+            if not _atexit_registered:
+                atexit.register(shutdown)
+                _atexit_registered = True
+
+
+def configure_logging(
+    json_lines: Optional[bool] = None,
+    rotation: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+    backup_count: Optional[int] = None,
+    when: Optional[str] = None,
+    rate: Optional[float] = None,
+    burst: Optional[int] = None,
+    console: Optional[bool] = None,
+) -> None:
+    """
+    Sets the logging backend options; arguments left as None keep their value.
+    Call it before the first setup_logger(), files already opened keep their format.
+
+    Args:
+        json_lines (Optional[bool]): Write the log files as JSON lines.
+        rotation (Optional[str]): "size" for RotatingFileHandler, "time" for TimedRotatingFileHandler.
+        max_bytes (Optional[int]): Size a file is rotated at with "size".
+        backup_count (Optional[int]): Rotated files kept.
+        when (Optional[str]): TimedRotatingFileHandler interval with "time", e.g. "midnight" or "H".
+        rate (Optional[float]): Repeats per second of one debug/info message let through, 0 disables the limit.
+        burst (Optional[int]): Repeats let through before the rate applies.
+        console (Optional[bool]): Also print to stderr.
+    """
+    options = dict(json_lines=json_lines, rotation=rotation, max_bytes=max_bytes, backup_count=backup_count,
+                   when=when, rate=rate, burst=burst, console=console)
+    if rotation not in (None, "size", "time"):
+        raise ValueError(f"Unknown rotation: {rotation}")
+    _config.update({name: value for name, value in options.items() if value is not None})
+
 
 def setup_logger(logger_name: str, log_file: Optional[str] = None, log_level: int = logging.DEBUG) -> logging.Logger:
     """
     Sets up a logger with both console and optional file logging.
 
+    Records only go through a queue on the calling thread; a background listener
+    does the formatting and the disk and console writes, so a monitoring loop
+    never waits on I/O.
+
     Args:
         logger_name (str): The name of the logger.
         log_file (Optional[str]): The file to log messages to. If None, no file logging is configured.
@@ -19,20 +225,27 @@ def setup_logger(logger_name: str, log_file: Optional[str] = None, log_level: in
 
     # Check if the logger already has handlers (to avoid duplicate logs)
     if not logger.handlers:
-        # Create a log message formatter
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        _start_listener()
+        handler = _FileQueueHandler(log_file)
+        handler.setLevel(log_level)
+        handler.addFilter(RateLimitFilter(_config["rate"], _config["burst"]))
+        logger.addHandler(handler)
 
-        # Add file handler if a log file is provided
-        if log_file:
-            file_handler = logging.FileHandler(log_file)
-            file_handler.setLevel(log_level)
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+    return logger
 
-        # Create a console (stream) handler
-        stream_handler = logging.StreamHandler()
-        stream_handler.setLevel(log_level)
-        stream_handler.setFormatter(formatter)
-        logger.addHandler(stream_handler)
 
-    return logger
+# the name the modules call it by
+log = setup_logger
+
+
+def shutdown() -> None:
+    """
+    Writes out the queued records and stops the listener; logging after it starts a new one.
+    """
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
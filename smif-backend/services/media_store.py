@@ -0,0 +1,230 @@
+import hashlib
+import os
+import shutil
+import uuid
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+import models
+from services import logSetup
+from services.image_handler import ImageHandler
+
+
+class StoredMedia(NamedTuple):
+    """
+    A file in the store as seen through one view, path is None until it is linked.
+    """
+    path: Optional[str]
+    blob_path: str
+    size: int
+    digest: str
+    is_new: bool
+
+
+class MediaStore:
+    """
+    Content addressed store for downloaded media. Every unique file is kept once
+    under its digest and the per person paths are hardlinks to it, so a picture
+    that is already stored costs no extra disk.
+    """
+
+    def __init__(self, root: str = "Files/.store", session_factory: Optional[Callable] = None, logger=None):
+        """
+        Initializes the store.
+
+        Args:
+            root (str): Directory holding the blobs. Views must be on the same filesystem to be hardlinks.
+            session_factory (Optional[Callable]): Returns a new session. Defaults to models.openSession.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.root = root
+        self.temp_dir = os.path.join(root, "tmp")
+        self.session_factory = session_factory or models.openSession
+        self.logger = logger or logSetup.setup_logger("MediaStore", "log.txt")
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        """
+        Sharded location of a digest, e.g. root/ab/cd/abcd...
+        """
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def lookup(self, digest: str) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: The blob path of the digest if it is stored.
+        """
+        session = self.session_factory()
+        try:
+            blob = session.get(models.mediaBlob, digest)
+            return blob.path if blob else None
+        finally:
+            session.close()
+
+    def put(self, temp_path: str, digest: str, size: int) -> Tuple[str, bool]:
+        """
+        Moves a downloaded file into the store, or drops it if the digest is already stored.
+
+        Returns:
+            Tuple[str, bool]: The blob path and True if the blob is new.
+        """
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            os.unlink(temp_path)
+            is_new = False
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(temp_path, blob_path)
+            is_new = True
+
+        session = self.session_factory()
+        try:
+            if session.get(models.mediaBlob, digest) is None:
+                session.add(models.mediaBlob(hash=digest, path=blob_path, size=size, refCount=0))
+                session.commit()
+        except IntegrityError:
+            # another writer indexed the same digest first
+            session.rollback()
+        finally:
+            session.close()
+        return blob_path, is_new
+
+    def link(self, digest: str, view_path: str) -> str:
+        """
+        Makes view_path point at the blob and counts the reference. A view that
+        already shows another stored blob gives up its reference to it first.
+
+        Returns:
+            str: The view path.
+        """
+        blob_path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(view_path) or ".", exist_ok=True)
+        if os.path.lexists(view_path):
+            old_digest = self._view_digest(view_path)
+            if old_digest == digest:
+                # already this blob, and already counted
+                return view_path
+            if old_digest and self.lookup(old_digest):
+                self.unlink(view_path, old_digest)
+            else:
+                os.unlink(view_path)
+        try:
+            os.link(blob_path, view_path)
+        except OSError:
+            # other filesystem or no hardlinks, a symlink still costs no extra disk
+            try:
+                os.symlink(os.path.abspath(blob_path), view_path)
+            except OSError:
+                shutil.copyfile(blob_path, view_path)
+        self._add_reference(digest, 1)
+        return view_path
+
+    def unlink(self, view_path: str, digest: str) -> None:
+        """
+        Removes a view and deletes the blob once nothing references it.
+        """
+        if os.path.lexists(view_path):
+            os.unlink(view_path)
+        if self._add_reference(digest, -1) <= 0:
+            self._collect(digest)
+
+    def discard(self, digest: str) -> None:
+        """
+        Deletes a fetched blob that was never linked; a blob with references is kept.
+        """
+        session = self.session_factory()
+        try:
+            blob = session.get(models.mediaBlob, digest)
+            referenced = blob is not None and blob.refCount > 0
+        finally:
+            session.close()
+        if not referenced:
+            self._collect(digest)
+
+    @staticmethod
+    def _view_digest(view_path: str, hash_name: str = "md5") -> Optional[str]:
+        # hardlinks, symlinks and copies alike, hashed the way stream_download hashed the blob
+        if not os.path.exists(view_path):
+            return None
+        hasher = hashlib.new(hash_name)
+        with open(view_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 16), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def _collect(self, digest: str) -> None:
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            os.unlink(blob_path)
+        session = self.session_factory()
+        try:
+            session.query(models.mediaBlob).filter(models.mediaBlob.hash == digest, models.mediaBlob.refCount <= 0).delete()
+            session.commit()
+        finally:
+            session.close()
+        self.logger.info(f"Deleted unreferenced blob {digest}")
+
+    def _add_reference(self, digest: str, delta: int) -> int:
+        session = self.session_factory()
+        try:
+            session.execute(
+                update(models.mediaBlob)
+                .where(models.mediaBlob.hash == digest)
+                .values(refCount=models.mediaBlob.refCount + delta)
+            )
+            session.commit()
+            blob = session.get(models.mediaBlob, digest)
+            return blob.refCount if blob else 0
+        finally:
+            session.close()
+
+    def fetch(self, url: str, cache=None) -> StoredMedia:
+        """
+        Streams a URL into the store without a view or a reference. link() the digest
+        once it is used, or discard() it when it is not.
+
+        Args:
+            url (str): The URL of the file.
+            cache (Optional[ValidatorCache]): Send the validators of the last download of the URL;
+                a 304 for a blob that is still stored reuses it without streaming or hashing.
+
+        Returns:
+            StoredMedia: The blob and whether the content was new, path is None.
+
+        Raises:
+            RuntimeError: If the file cannot be downloaded.
+        """
+        temp_path = os.path.join(self.temp_dir, uuid.uuid4().hex)
+        result = ImageHandler.stream_download(temp_path, url, cache=cache)
+        if result.not_modified:
+            blob_path = self.lookup(result.digest)
+            if blob_path and os.path.exists(blob_path):
+                self.logger.info(f"{url} not modified, stored as {result.digest}")
+                return StoredMedia(None, blob_path, result.size, result.digest, False)
+            # collected since the last download, fetch the body again
+            result = ImageHandler.stream_download(temp_path, url)
+        blob_path, is_new = self.put(result.path, result.digest, result.size)
+        if not is_new:
+            self.logger.info(f"{url} is already stored as {result.digest}")
+        return StoredMedia(None, blob_path, result.size, result.digest, is_new)
+
+    def download(self, url: str, view_path: str, cache=None) -> StoredMedia:
+        """
+        Streams a URL into the store and exposes it at view_path.
+
+        Args:
+            url (str): The URL of the file.
+            view_path (str): The per person path the file should appear at.
+            cache (Optional[ValidatorCache]): See fetch().
+
+        Returns:
+            StoredMedia: The view, the blob and whether the content was new.
+
+        Raises:
+            RuntimeError: If the file cannot be downloaded.
+        """
+        stored = self.fetch(url, cache=cache)
+        self.link(stored.digest, view_path)
+        return stored._replace(path=view_path)
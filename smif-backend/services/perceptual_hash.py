@@ -0,0 +1,139 @@
+import numpy as np
+from PIL import Image as PILImage
+from typing import Iterable, List, Union
+
+# max hamming distance between two 64 bit hashes of the same picture
+DEFAULT_THRESHOLD = 10
+
+HASH_SIZE = 8
+PHASH_SIZE = 32
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    # orthonormal DCT-II basis, C @ X @ C.T is the 2D DCT of X
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+_BIT_WEIGHTS = np.uint64(1) << np.arange(63, -1, -1, dtype=np.uint64)
+
+
+class PerceptualHash:
+    """
+    aHash, dHash and pHash of images as 64 bit ints. Unlike MD5 they survive
+    re-encoding and resizing, so two hashes of the same picture differ in a few bits.
+    """
+
+    @staticmethod
+    def load_gray(source: Union[str, PILImage.Image], width: int, height: int) -> np.ndarray:
+        """
+        Loads an image as a float grayscale array of the given size.
+
+        Args:
+            source (Union[str, PIL.Image.Image]): Path of the image or an opened image.
+            width (int): Width to resize to.
+            height (int): Height to resize to.
+
+        Returns:
+            np.ndarray: Array of shape (height, width).
+        """
+        if isinstance(source, str):
+            with PILImage.open(source) as image:
+                return PerceptualHash.load_gray(image, width, height)
+        gray = source.convert("L").resize((width, height), PILImage.LANCZOS)
+        return np.asarray(gray, dtype=np.float64)
+
+    @staticmethod
+    def average_hash_array(pixels: np.ndarray) -> np.ndarray:
+        """
+        aHash bits of one (8, 8) array or a stack (n, 8, 8) of them.
+        """
+        flat = pixels.reshape(*pixels.shape[:-2], -1)
+        return flat > flat.mean(axis=-1, keepdims=True)
+
+    @staticmethod
+    def difference_hash_array(pixels: np.ndarray) -> np.ndarray:
+        """
+        dHash bits of one (8, 9) array or a stack (n, 8, 9) of them.
+        """
+        bits = pixels[..., :, 1:] > pixels[..., :, :-1]
+        return bits.reshape(*bits.shape[:-2], -1)
+
+    @staticmethod
+    def phash_array(pixels: np.ndarray) -> np.ndarray:
+        """
+        pHash bits of one (32, 32) array or a stack (n, 32, 32) of them.
+        """
+        dct = _DCT @ pixels @ _DCT.T
+        low = dct[..., :HASH_SIZE, :HASH_SIZE].reshape(*dct.shape[:-2], -1)
+        # the DC term only carries the average brightness, leave it out of the median
+        median = np.median(low[..., 1:], axis=-1, keepdims=True)
+        return low > median
+
+    @staticmethod
+    def average_hash(source) -> int:
+        pixels = PerceptualHash.load_gray(source, HASH_SIZE, HASH_SIZE)
+        return PerceptualHash.to_int(PerceptualHash.average_hash_array(pixels))
+
+    @staticmethod
+    def difference_hash(source) -> int:
+        pixels = PerceptualHash.load_gray(source, HASH_SIZE + 1, HASH_SIZE)
+        return PerceptualHash.to_int(PerceptualHash.difference_hash_array(pixels))
+
+    @staticmethod
+    def phash(source) -> int:
+        pixels = PerceptualHash.load_gray(source, PHASH_SIZE, PHASH_SIZE)
+        return PerceptualHash.to_int(PerceptualHash.phash_array(pixels))
+
+    @staticmethod
+    def phash_many(sources: Iterable) -> List[int]:
+        """
+        pHash of many images with one stacked DCT instead of one per image.
+        """
+        stack = np.stack([PerceptualHash.load_gray(source, PHASH_SIZE, PHASH_SIZE) for source in sources])
+        return PerceptualHash.to_ints(PerceptualHash.phash_array(stack))
+
+    @staticmethod
+    def to_int(bits: np.ndarray) -> int:
+        """
+        Packs 64 hash bits, most significant first, into an int.
+        """
+        return int((bits.reshape(64).astype(np.uint64) * _BIT_WEIGHTS).sum(dtype=np.uint64))
+
+    @staticmethod
+    def to_ints(bits: np.ndarray) -> List[int]:
+        """
+        Packs a stack (n, 64) of hash bits into ints.
+        """
+        values = (bits.reshape(-1, 64).astype(np.uint64) * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+        return [int(value) for value in values]
+
+    @staticmethod
+    def to_hex(value: int) -> str:
+        return f"{value:016x}"
+
+    @staticmethod
+    def from_hex(value: str) -> int:
+        return int(value, 16)
+
+    @staticmethod
+    def hamming(first: Union[int, str], second: Union[int, str]) -> int:
+        """
+        Number of differing bits between two hashes given as ints or hex strings.
+        """
+        if isinstance(first, str):
+            first = int(first, 16)
+        if isinstance(second, str):
+            second = int(second, 16)
+        return bin(first ^ second).count("1")
+
+    @staticmethod
+    def is_similar(first: Union[int, str], second: Union[int, str], threshold: int = DEFAULT_THRESHOLD) -> bool:
+        """
+        True if the two hashes are within threshold bits of each other.
+        """
+        return PerceptualHash.hamming(first, second) <= threshold
@@ -0,0 +1,139 @@
+import atexit
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Callable, Optional
+
+import models
+from services import logSetup
+
+
+class PresenceWriter:
+    """
+    Collects onlineLog samples in memory and writes them with bulk inserts
+    from a background thread, instead of one ORM object and commit per poll.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        logger=None,
+    ):
+        """
+        Initializes the writer and starts the flush thread.
+
+        Args:
+            session_factory (Optional[Callable]): Returns a new session. Defaults to models.openSession.
+            batch_size (int): Number of buffered samples that triggers a flush.
+            flush_interval (float): Seconds after which buffered samples are flushed anyway.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.session_factory = session_factory or models.openSession
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger or logSetup.setup_logger("PresenceWriter", "log.txt")
+        self.rows_written = 0
+        self._user_ids = array("q")
+        self._time_stamps = array("d")
+        self._statuses = array("b")
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="PresenceWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, whatsapp_user_id: int, status: bool, time_stamp: Optional[float] = None) -> None:
+        """
+        Buffers one presence sample.
+
+        Args:
+            whatsapp_user_id (int): The whatsApp.whatsappUserId of the target.
+            status (bool): True if the target was online.
+            time_stamp (Optional[float]): Unix time of the sample. Defaults to now.
+        """
+        with self._lock:
+            self._user_ids.append(whatsapp_user_id)
+            self._time_stamps.append(time.time() if time_stamp is None else time_stamp)
+            self._statuses.append(1 if status else 0)
+            full = len(self._user_ids) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._user_ids)
+
+    def _swap(self):
+        with self._lock:
+            buffers = self._user_ids, self._time_stamps, self._statuses
+            self._user_ids, self._time_stamps, self._statuses = array("q"), array("d"), array("b")
+        return buffers
+
+    def _restore(self, user_ids, time_stamps, statuses) -> None:
+        # put a failed batch back in front of the samples that arrived meanwhile
+        with self._lock:
+            user_ids.extend(self._user_ids)
+            time_stamps.extend(self._time_stamps)
+            statuses.extend(self._statuses)
+            self._user_ids, self._time_stamps, self._statuses = user_ids, time_stamps, statuses
+
+    def flush(self) -> int:
+        """
+        Writes every buffered sample in one executemany insert and one commit.
+
+        Returns:
+            int: The number of rows written.
+        """
+        with self._flush_lock:
+            user_ids, time_stamps, statuses = self._swap()
+            if not user_ids:
+                return 0
+            rows = [
+                {"whatsappUserId": user_id, "timeStamp": datetime.fromtimestamp(time_stamp), "status": bool(status)}
+                for user_id, time_stamp, status in zip(user_ids, time_stamps, statuses)
+            ]
+            session = self.session_factory()
+            if not session:
+                self.logger.error("Failed to create a session, keeping the samples buffered")
+                self._restore(user_ids, time_stamps, statuses)
+                return 0
+            try:
+                session.execute(models.onlineLog.__table__.insert(), rows)
+                session.commit()
+                self.rows_written += len(rows)
+                return len(rows)
+            except Exception as e:
+                session.rollback()
+                self.logger.error(f"Error writing {len(rows)} presence samples: {e}")
+                self._restore(user_ids, time_stamps, statuses)
+                return 0
+            finally:
+                session.close()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """
+        Stops the flush thread and writes whatever is still buffered.
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+        self.logger.info(f"PresenceWriter closed after writing {self.rows_written} rows")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
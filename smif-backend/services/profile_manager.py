@@ -0,0 +1,189 @@
+import fcntl
+import itertools
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, NamedTuple, Optional
+
+from services import logSetup
+
+# linux ioctl that makes dst share the extents of src (btrfs, xfs, bcachefs), copy on write
+FICLONE = 0x40049409
+
+# held by the running firefox, a clone must not inherit them
+LOCK_FILES = {"lock", ".parentlock", "parent.lock"}
+# rebuilt by firefox on demand, not worth cloning
+SKIP_DIRS = {"cache2", "startupCache", "thumbnails", "shader-cache", "jumpListCache", "crashes", "minidumps",
+             "saved-telemetry-pings", "datareporting"}
+# written in place, sharing them through a hardlink would let one clone corrupt the others
+MUTABLE_SUFFIXES = (".sqlite", ".sqlite-wal", ".sqlite-shm", ".sqlite-journal", ".db", ".ldb", ".log")
+# never modified by firefox once written, safe to hardlink when reflinks are not available
+IMMUTABLE_SUFFIXES = (".xpi", ".dic", ".aff", ".png", ".ico", ".ttf", ".woff", ".woff2")
+IMMUTABLE_DIRS = {"extensions", "features", "chrome"}
+
+
+class CloneStats(NamedTuple):
+    """
+    How the files of one clone were produced.
+    """
+    path: str
+    reflinked: int
+    hardlinked: int
+    copied: int
+    skipped: int
+    bytes_copied: int
+    elapsed: float
+
+
+class ProfileManager:
+    """
+    Keeps one golden, logged-in Firefox profile and hands every driver its own
+    throwaway clone of it, so several drivers can run the same account at once.
+
+    Files are reflinked where the filesystem supports it, which costs no time
+    and no space. Otherwise immutable files are hardlinked and the mutable ones
+    (sqlite, IndexedDB) are copied, so the clone only pays for those.
+    """
+
+    def __init__(self, golden_path: str, clones_root: Optional[str] = None, logger=None):
+        """
+        Initializes the manager.
+
+        Args:
+            golden_path (str): The logged-in profile that clones are made from, never launched by the manager.
+            clones_root (Optional[str]): Where clones are created. Defaults to a directory next to the golden
+                profile, reflinks and hardlinks need both on the same filesystem.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.golden_path = os.path.abspath(golden_path)
+        self.clones_root = clones_root or f"{self.golden_path}.clones"
+        self.logger = logger or logSetup.setup_logger("ProfileManager", "webdriverLog.txt")
+        self._clones: Dict[str, CloneStats] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._reflink_ok: Dict[int, bool] = {}
+        os.makedirs(self.clones_root, exist_ok=True)
+
+    def _reflink(self, src: str, dst: str) -> bool:
+        device = os.stat(os.path.dirname(dst)).st_dev
+        if self._reflink_ok.get(device) is False:
+            return False
+        try:
+            with open(src, "rb") as source, open(dst, "wb") as target:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            shutil.copystat(src, dst)
+            self._reflink_ok[device] = True
+            return True
+        except OSError:
+            # not supported by this filesystem, do not try again for every file
+            os.unlink(dst)
+            self._reflink_ok[device] = False
+            return False
+
+    @staticmethod
+    def _is_immutable(relative: str) -> bool:
+        parts = relative.split(os.sep)
+        return parts[0] in IMMUTABLE_DIRS or relative.endswith(IMMUTABLE_SUFFIXES)
+
+    def clone(self, golden_path: Optional[str] = None) -> str:
+        """
+        Clones the golden profile.
+
+        Args:
+            golden_path (Optional[str]): Clone this profile instead of the manager's golden one.
+
+        Returns:
+            str: The path of the clone, pass it to --profile and remove() it afterwards.
+
+        Raises:
+            FileNotFoundError: If the golden profile does not exist.
+        """
+        golden = os.path.abspath(golden_path or self.golden_path)
+        if not os.path.isdir(golden):
+            raise FileNotFoundError(f"Golden profile does not exist: {golden}")
+        if any(os.path.lexists(os.path.join(golden, name)) for name in LOCK_FILES):
+            self.logger.warning(f"Golden profile {golden} looks in use, its databases may be mid write")
+
+        path = os.path.join(self.clones_root, f"clone-{os.getpid()}-{next(self._counter)}")
+        started = time.perf_counter()
+        reflinked = hardlinked = copied = skipped = bytes_copied = 0
+        for directory, dirs, files in os.walk(golden):
+            dirs[:] = [name for name in dirs if name not in SKIP_DIRS]
+            relative_dir = os.path.relpath(directory, golden)
+            os.makedirs(os.path.join(path, relative_dir), exist_ok=True)
+            for name in files:
+                if name in LOCK_FILES:
+                    skipped += 1
+                    continue
+                relative = os.path.normpath(os.path.join(relative_dir, name))
+                src, dst = os.path.join(golden, relative), os.path.join(path, relative)
+                if os.path.islink(src):
+                    os.symlink(os.readlink(src), dst)
+                    copied += 1
+                elif self._reflink(src, dst):
+                    reflinked += 1
+                elif self._is_immutable(relative) and not relative.endswith(MUTABLE_SUFFIXES):
+                    os.link(src, dst)
+                    hardlinked += 1
+                else:
+                    shutil.copy2(src, dst)
+                    copied += 1
+                    bytes_copied += os.path.getsize(dst)
+
+        stats = CloneStats(path, reflinked, hardlinked, copied, skipped, bytes_copied, time.perf_counter() - started)
+        with self._lock:
+            self._clones[path] = stats
+        self.logger.info(f"Cloned {golden} to {path} in {stats.elapsed:.2f}s "
+                         f"({reflinked} reflinked, {hardlinked} hardlinked, {copied} copied, {bytes_copied} bytes)")
+        return path
+
+    def remove(self, path: str) -> None:
+        """
+        Deletes a clone. Hardlinked files only lose a link, the golden profile keeps its copy.
+        """
+        with self._lock:
+            self._clones.pop(path, None)
+        shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def lease(self, golden_path: Optional[str] = None):
+        """
+        Context manager around clone() and remove(); yields the clone path.
+        """
+        path = self.clone(golden_path)
+        try:
+            yield path
+        finally:
+            self.remove(path)
+
+    def cleanup(self) -> int:
+        """
+        Removes the clones of this manager and the ones left behind by dead processes.
+
+        Returns:
+            int: The number of clones removed.
+        """
+        with self._lock:
+            own = list(self._clones)
+        for path in own:
+            self.remove(path)
+        removed = len(own)
+        for name in os.listdir(self.clones_root):
+            parts = name.split("-")
+            if len(parts) != 3 or parts[0] != "clone" or not parts[1].isdigit():
+                continue
+            if int(parts[1]) != os.getpid() and not os.path.exists(f"/proc/{parts[1]}"):
+                shutil.rmtree(os.path.join(self.clones_root, name), ignore_errors=True)
+                removed += 1
+        self.logger.info(f"Removed {removed} profile clones")
+        return removed
+
+    def stats(self, path: str) -> Optional[CloneStats]:
+        """
+        Returns:
+            Optional[CloneStats]: How a live clone of this manager was made.
+        """
+        with self._lock:
+            return self._clones.get(path)
@@ -1,12 +1,9 @@
 #!/usr/bin/python3
 
-from BaseClass import * 
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
-from cryptography.fernet import Fernet
+from services.base_class import *
+from services.image_handler import ImageHandler
+from services.perceptual_hash import PerceptualHash, DEFAULT_THRESHOLD
+from services.vault import Vault, LEGACY_SALT
 import base64
 import json
 import getpass 
@@ -15,25 +12,35 @@ import getpass
 logger = logSetup.log("SharedMethods","log.txt")
 
 class Image():
-    def __init__(self, imageUrl=None, imageHash=None, imageName=None, listOfUrls=None):
+    def __init__(self, imageUrl=None, imageHash=None, imageName=None, listOfUrls=None, imagePHash=None):
         self.logger = logger
         self.Path = imageName
         self.URL = imageUrl
         self.Hash = imageHash
         self.FileName = imageName
         self.UrlList = listOfUrls
+        self.Size = None
+        self.NotModified = False
+        self.PHash = imagePHash # hex pHash, close for re-encoded or resized copies of the same picture
 
-    def DownloadImage(self):
+    def DownloadImage(self, cache=None):
+        # streamed to disk and hashed on the way, no need to GenerateImageHash after it
+        # with a ValidatorCache an unchanged image is a 304 and NotModified is set
         self.logger.info(f"starting downloading {self.URL}")
-        response = BaseClass.sendRequest(self.URL)
-        if BaseClass.checkResponseResult(response) and self.FileName:
-            ImageData = response.content
-            BaseClass.WriteImage(self.FileName, ImageData)
-            self.logger.info(f"Done saving the image {self.FileName}")
-            return True
-        else:
+        if not self.FileName:
+            self.logger.error(f"no file name to save {self.URL}")
+            return False
+        try:
+            result = ImageHandler.stream_download(self.FileName, self.URL, cache=cache)
+        except RuntimeError:
             self.logger.error(f"can't download the image {self.URL} ")
             return False
+        self.Path = result.path
+        self.Size = result.size
+        self.Hash = result.digest
+        self.NotModified = result.not_modified
+        self.logger.info(f"Done saving the image {self.FileName}")
+        return True
 
     def DownloadListOfImages(self):
         if self.UrlList:
@@ -47,7 +54,10 @@ class Image():
                 self.logger.info("Done Downloading all the Images")
                 return True
 
-    def isTheSameImage(self, Image1, Image2):
+    def isTheSameImage(self, Image1, Image2, threshold=DEFAULT_THRESHOLD):
+        '''
+            same bytes, or perceptual hashes within threshold bits of each other
+        '''
         if not (Image1.Hash and Image2.Hash):
             self.logger.info("one image has no Hash starting to generate hash for both")
             imag1Hash = Image1.GenerateImageHash()
@@ -55,8 +65,22 @@ class Image():
         
         if Image1.Hash == Image2.Hash:
             return True
-        else:
+
+        if not (Image1.PHash or Image1.GeneratePerceptualHash()) or not (Image2.PHash or Image2.GeneratePerceptualHash()):
             return False
+        distance = PerceptualHash.hamming(Image1.PHash, Image2.PHash)
+        self.logger.info(f"perceptual distance between the images is {distance}")
+        return distance <= threshold
+
+    def GeneratePerceptualHash(self):
+        if BaseClass.checkIfFileExist(self.Path):
+            try:
+                self.PHash = PerceptualHash.to_hex(PerceptualHash.phash(self.Path))
+                return self.PHash
+            except Exception as e:
+                self.logger.error(f"can't generate the perceptual hash {e}")
+        else:
+            self.logger.info("can't find the image path")
             
    
 
@@ -91,21 +115,14 @@ class Encrypt:
         self.filePath = filePath
         self.password = password
 
-    def generateKey(self, password):
-        salt = b'HopeIsLife'  # Salt for key derivation
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            iterations=100000,  # You can adjust the number of iterations as needed
-            salt=salt,
-            length=32,  # Key length (32 bytes for Fernet)
-            backend=default_backend()
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key
+    def generateKey(self, password, salt=LEGACY_SALT):
+        # derived once per process by the vault, every Encrypt of the same password reuses it
+        return Vault.default().derive_key(password, salt)
 
 
     # Function to decrypt data with the provided key
     def decryptData(self, data, key):
+        from cryptography.fernet import Fernet
         try:
             cipher_suite = Fernet(key)
             return cipher_suite.decrypt(data).decode()
@@ -123,14 +140,24 @@ class Encrypt:
             return None
     
     def loadData(self):
-        passKey = self.generateKey(self.password)
-        loadedData =  self.readEData(self.filePath)
-        if loadedData:
-            data = self.decryptData(loadedData,passKey)
-            if data:
-                self.data = json.loads(data)
-                return self.data
-        return None
+        # the vault keeps the decrypted file in memory for its ttl, and reads both
+        # the old files with the fixed salt and the new ones with a salt header
+        try:
+            self.data = Vault.default().read_secret(self.filePath, self.password)
+            return self.data
+        except (OSError, ValueError) as error:
+            logger.error(f"can't load the encrypted file {self.filePath} {error}")
+            return None
+
+    def saveData(self, data):
+        # written with a random salt in the file header
+        try:
+            Vault.default().write_secret(self.filePath, data, self.password)
+            self.data = data
+            return True
+        except OSError as error:
+            logger.error(f"can't write the encrypted file {self.filePath} {error}")
+            return False
 
 if __name__ == "__main__":
     print("hello")
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, NamedTuple, Optional
+
+from services import logSetup
+
+TIERS = ("http", "browser")
+
+
+class _NotFound:
+    """
+    A definitive answer that the entity does not exist. It stops the escalation
+    like data does, and is falsy so callers checking the value stay correct.
+    """
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __repr__(self) -> str:
+        return "NOT_FOUND"
+
+
+NOT_FOUND = _NotFound()
+
+
+class FetchOutcome(NamedTuple):
+    """
+    The value of a tiered fetch and the tier that produced it, None if no tier did.
+    """
+    value: Any
+    tier: Optional[str]
+
+
+class TierStats:
+    """
+    Counters and recent latencies of one tier of one field.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.attempts = 0
+        self.hits = 0
+        self.not_found = 0
+        self.empty = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, elapsed: float, outcome: str) -> None:
+        self.attempts += 1
+        self.total_time += elapsed
+        self.latencies.append(elapsed)
+        if outcome == "hit":
+            self.hits += 1
+        elif outcome == "not_found":
+            self.not_found += 1
+        elif outcome == "empty":
+            self.empty += 1
+        else:
+            self.errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            return latencies[min(int(fraction * len(latencies)), len(latencies) - 1)] if latencies else None
+
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "not_found": self.not_found,
+            "empty": self.empty,
+            "errors": self.errors,
+            "hit_rate": self.hits / self.attempts if self.attempts else None,
+            "mean_latency": self.total_time / self.attempts if self.attempts else None,
+            "p50_latency": percentile(0.5),
+            "p95_latency": percentile(0.95),
+        }
+
+
+class TieredFetcher:
+    """
+    Fetches a field with the cheap HTTP extractor first and escalates to the
+    browser extractor only when HTTP raises or returns no data (None). An extractor
+    that knows the entity does not exist returns NOT_FOUND, which is not escalated.
+
+    Platform classes declare their extractors by method name:
+
+        fetchTiers = {'protected': ('NoAPICheckIfProtectedAcc', 'browserCheckIfProtectedAcc')}
+
+    A tier can be None when the platform has no extractor for it.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, logger=None):
+        """
+        Initializes the fetcher.
+
+        Args:
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.logger = logger or logSetup.setup_logger("TieredFetcher", "log.txt")
+        self._stats: Dict[str, Dict[str, TierStats]] = {}
+        self._fetches: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "TieredFetcher":
+        """
+        The process wide fetcher, so the stats cover every module.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def fetch(self, source, field: str, *args, **kwargs) -> FetchOutcome:
+        """
+        Runs the extractors of a field tier by tier until one returns data.
+
+        Args:
+            source: The platform instance declaring fetchTiers, e.g. a Twitter.
+            field (str): The field to fetch, a key of source.fetchTiers.
+            *args, **kwargs: Passed to the extractors.
+
+        Returns:
+            FetchOutcome: The value, NOT_FOUND included, and the tier that produced it.
+        """
+        key = f"{type(source).__name__.lower()}.{field}"
+        extractors = source.fetchTiers[field]
+        with self._lock:
+            self._fetches[key] = self._fetches.get(key, 0) + 1
+            stats = self._stats.setdefault(key, {tier: TierStats() for tier in TIERS})
+
+        for tier, name in zip(TIERS, extractors):
+            if name is None:
+                continue
+            started = time.perf_counter()
+            try:
+                value = getattr(source, name)(*args, **kwargs)
+                outcome = "not_found" if value is NOT_FOUND else "hit" if value is not None else "empty"
+            except Exception as e:
+                value, outcome = None, "error"
+                self.logger.error(f"{key} {tier} tier failed: {e}")
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats[tier].record(elapsed, outcome)
+            if outcome in ("hit", "not_found"):
+                return FetchOutcome(value, tier)
+            if outcome == "empty":
+                self.logger.info(f"{key} {tier} tier returned no data after {elapsed:.2f}s")
+        return FetchOutcome(None, None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            Dict[str, Dict[str, Any]]: Per "platform.field", the fetch count, the share of
+                fetches that needed the browser, and the summary of every tier.
+        """
+        with self._lock:
+            report = {}
+            for key, tiers in self._stats.items():
+                fetches = self._fetches.get(key, 0)
+                report[key] = {
+                    "fetches": fetches,
+                    "browser_rate": tiers["browser"].attempts / fetches if fetches else None,
+                    **{tier: tier_stats.summary() for tier, tier_stats in tiers.items()},
+                }
+            return report
@@ -0,0 +1,173 @@
+import base64
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from services import logSetup
+
+MAGIC = b"SMIFV1"
+# magic, iterations, salt length, then the salt and the Fernet token
+HEADER = struct.Struct(">6sIB")
+DEFAULT_ITERATIONS = 100000
+SALT_SIZE = 16
+# files written by Encrypt before the vault have no header and share this salt
+LEGACY_SALT = b"HopeIsLife"
+
+
+class Vault:
+    """
+    Reads encrypted secret files and keeps what it decrypted in memory.
+
+    Key derivation (PBKDF2-HMAC-SHA256) runs once per password, salt and
+    iteration count per process, and a decrypted file is served from memory
+    until its TTL expires or the file changes on disk, so hundreds of module
+    instances reading the same tokens cost one derivation.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, ttl: Optional[float] = 300, logger=None):
+        """
+        Initializes the vault.
+
+        Args:
+            ttl (Optional[float]): Seconds a decrypted file is kept in memory. None keeps it until forget().
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.ttl = ttl
+        self.logger = logger or logSetup.setup_logger("Vault", "log.txt")
+        self.derivations = 0
+        self._keys: Dict[Tuple[bytes, bytes, int], bytes] = {}
+        self._secrets: Dict[Tuple[str, bytes], Tuple[float, float, Any]] = {}
+        self._key_locks: Dict[Tuple[bytes, bytes, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "Vault":
+        """
+        The process wide vault, so every module shares the derived keys.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @staticmethod
+    def _password_id(password: str) -> bytes:
+        # the cache is keyed by a digest, the password itself is not kept
+        return hashlib.sha256(password.encode()).digest()
+
+    def derive_key(self, password: str, salt: bytes, iterations: int = DEFAULT_ITERATIONS) -> bytes:
+        """
+        Returns:
+            bytes: The urlsafe base64 Fernet key, derived on the first call only.
+        """
+        cache_key = (self._password_id(password), salt, iterations)
+        with self._lock:
+            key = self._keys.get(cache_key)
+            if key is not None:
+                return key
+            key_lock = self._key_locks.setdefault(cache_key, threading.Lock())
+        # threads asking for the same key wait for one derivation instead of running their own
+        with key_lock:
+            with self._lock:
+                key = self._keys.get(cache_key)
+            if key is None:
+                from cryptography.hazmat.primitives import hashes
+                from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+                started = time.perf_counter()
+                kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+                key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+                with self._lock:
+                    self._keys[cache_key] = key
+                    self.derivations += 1
+                self.logger.debug(f"Derived a key with {iterations} iterations in {time.perf_counter() - started:.2f}s")
+        return key
+
+    @staticmethod
+    def parse(blob: bytes) -> Tuple[bytes, int, bytes]:
+        """
+        Splits a secret file into salt, iterations and token; files without a header are legacy ones.
+        """
+        if blob.startswith(MAGIC):
+            _, iterations, salt_size = HEADER.unpack_from(blob)
+            start = HEADER.size
+            return blob[start:start + salt_size], iterations, blob[start + salt_size:]
+        return LEGACY_SALT, DEFAULT_ITERATIONS, blob
+
+    def read_secret(self, path: str, password: str) -> Any:
+        """
+        Decrypts a JSON secret file, or returns it from memory.
+
+        Args:
+            path (str): The encrypted file.
+            password (str): Its password.
+
+        Returns:
+            Any: The decoded JSON.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the password is wrong or the file is corrupted.
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime
+        cache_key = (path, self._password_id(password))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._secrets.get(cache_key)
+        if cached and cached[1] == mtime and (cached[0] is None or cached[0] > now):
+            return cached[2]
+
+        from cryptography.fernet import Fernet, InvalidToken
+
+        with open(path, "rb") as file:
+            salt, iterations, token = self.parse(file.read())
+        try:
+            data = json.loads(Fernet(self.derive_key(password, salt, iterations)).decrypt(token))
+        except (InvalidToken, ValueError) as e:
+            self.logger.error(f"Could not decrypt {path}")
+            raise ValueError(f"Invalid password or corrupted secret file: {path}") from e
+        expires = None if self.ttl is None else now + self.ttl
+        with self._lock:
+            self._secrets[cache_key] = (expires, mtime, data)
+        return data
+
+    def write_secret(self, path: str, data: Any, password: str, iterations: int = DEFAULT_ITERATIONS) -> None:
+        """
+        Encrypts data as JSON into a file with a header holding a new random salt.
+        Also upgrades legacy files: read them with read_secret and write them back.
+        """
+        from cryptography.fernet import Fernet
+
+        salt = os.urandom(SALT_SIZE)
+        token = Fernet(self.derive_key(password, salt, iterations)).encrypt(json.dumps(data).encode())
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".secret-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(HEADER.pack(MAGIC, iterations, len(salt)) + salt + token)
+            os.replace(temp_path, path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+        self.forget(path)
+
+    def forget(self, path: Optional[str] = None) -> None:
+        """
+        Drops the decrypted copy of a file, or of every file. The derived keys are kept.
+        """
+        with self._lock:
+            if path is None:
+                self._secrets.clear()
+            else:
+                path = os.path.abspath(path)
+                for cache_key in [cache_key for cache_key in self._secrets if cache_key[0] == path]:
+                    del self._secrets[cache_key]
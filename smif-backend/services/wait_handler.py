@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from services import logSetup
+
+# the element, or null until every image inside it settled: complete covers loaded and broken
+# images alike, a lazy image off screen never starts loading so it is not waited for
+IMAGES_LOADED_SCRIPT = """
+const node = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!node) { return null; }
+const images = node.tagName.toLowerCase() === 'img' ? [node] : Array.from(node.getElementsByTagName('img'));
+const onScreen = (image) => {
+    const box = image.getBoundingClientRect();
+    return box.bottom > 0 && box.right > 0 && box.top < window.innerHeight && box.left < window.innerWidth;
+};
+const settled = (image) => image.complete || (image.loading === 'lazy' && !onScreen(image));
+return images.every(settled) ? node : null;
+"""
+
+
+class StepTimings:
+    """
+    Observed latencies of every named wait step, used to size the next timeout
+    of that step and to report which step of the flow is the slowest.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        margin: float = 3.0,
+        min_timeout: float = 2.0,
+        min_samples: int = 5,
+        window: int = 100,
+    ):
+        """
+        Initializes the timings.
+
+        Args:
+            margin (float): The learned timeout is the p95 latency times this.
+            min_timeout (float): Lower bound of a learned timeout in seconds.
+            min_samples (int): Samples of a step needed before its timeout is learned.
+            window (int): Latencies kept per step.
+        """
+        self.margin = margin
+        self.min_timeout = min_timeout
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._timeouts: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> "StepTimings":
+        """
+        The process wide timings, so every driver learns from the others.
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def timeout_for(self, step: str, ceiling: float) -> float:
+        """
+        Args:
+            step (str): The step name.
+            ceiling (float): The fixed timeout the step used to have, never exceeded.
+
+        Returns:
+            float: The ceiling until enough samples are seen, then the learned timeout,
+                   doubled after every consecutive timeout of the step.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(step, ()))
+            misses = self._misses.get(step, 0)
+        if len(latencies) < self.min_samples:
+            return ceiling
+        p95 = latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)]
+        learned = max(self.min_timeout, p95 * self.margin) * (2 ** misses)
+        return min(ceiling, learned)
+
+    def record(self, step: str, elapsed: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(step, deque(maxlen=self.window)).append(elapsed)
+            self._misses[step] = 0
+
+    def record_timeout(self, step: str, waited: float) -> None:
+        """
+        Counts a timeout and keeps the time waited as a sample, the step took at least
+        that long, so a step that keeps timing out raises its p95 instead of only its misses.
+        """
+        with self._lock:
+            self._latencies.setdefault(step, deque(maxlen=self.window)).append(waited)
+            self._timeouts[step] = self._timeouts.get(step, 0) + 1
+            self._misses[step] = self._misses.get(step, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            Dict[str, Dict[str, Any]]: Per step, the sample count, mean/p95/max latency and timeouts,
+                                       slowest mean first.
+        """
+        with self._lock:
+            steps = set(self._latencies) | set(self._timeouts)
+            report = {}
+            for step in steps:
+                latencies = sorted(self._latencies.get(step, ()))
+                report[step] = {
+                    "samples": len(latencies),
+                    "mean": sum(latencies) / len(latencies) if latencies else None,
+                    "p95": latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)] if latencies else None,
+                    "max": latencies[-1] if latencies else None,
+                    "timeouts": self._timeouts.get(step, 0),
+                }
+        return dict(sorted(report.items(), key=lambda item: -(item[1]["mean"] or 0)))
+
+    def slowest(self, count: int = 3) -> List[str]:
+        """
+        Returns:
+            List[str]: The names of the steps with the highest mean latency.
+        """
+        return list(self.stats())[:count]
+
+
+class WaitHandler:
+    """
+    Waits for the exact DOM condition a scraping step needs instead of sleeping
+    a fixed time, and times every step by name. Timeouts raise selenium's
+    TimeoutException like WebDriverWait does.
+    """
+
+    def __init__(self, driver, timings: Optional[StepTimings] = None, poll: float = 0.1, logger=None):
+        """
+        Initializes the handler.
+
+        Args:
+            driver: The selenium webdriver.
+            timings (Optional[StepTimings]): Where latencies are learned. Defaults to the process wide one.
+            poll (float): Seconds between two checks of a condition.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.driver = driver
+        self.timings = timings or StepTimings.default()
+        self.poll = poll
+        self.logger = logger or logSetup.setup_logger("WaitHandler", "log.txt")
+
+    def until(self, step: str, condition: Callable, timeout: float) -> Any:
+        """
+        Waits until condition(driver) returns something truthy.
+
+        Args:
+            step (str): The step name latencies are recorded under.
+            condition (Callable): A selenium expected condition.
+            timeout (float): The longest the step may take, lowered once latencies are learned.
+
+        Returns:
+            Any: What the condition returned.
+
+        Raises:
+            TimeoutException: If the condition was not met in time.
+        """
+        limit = self.timings.timeout_for(step, timeout)
+        started = time.perf_counter()
+        try:
+            result = WebDriverWait(self.driver, limit, poll_frequency=self.poll).until(condition)
+        except TimeoutException:
+            self.timings.record_timeout(step, time.perf_counter() - started)
+            self.logger.error(f"step {step} timed out after {limit:.1f}s")
+            raise
+        elapsed = time.perf_counter() - started
+        self.timings.record(step, elapsed)
+        self.logger.debug(f"step {step} took {elapsed:.3f}s")
+        return result
+
+    def element(self, step: str, locator: str, timeout: float, by: str = By.XPATH):
+        """
+        Waits for an element to be in the DOM and returns it.
+        """
+        return self.until(step, EC.presence_of_element_located((by, locator)), timeout)
+
+    def attribute(self, step: str, xpath: str, name: str, timeout: float) -> str:
+        """
+        Waits for an attribute (or property, e.g. textContent) of an element to be non empty and returns it.
+        """
+        def populated(driver):
+            elements = driver.find_elements(By.XPATH, xpath)
+            return elements and elements[0].get_attribute(name) or False
+        return self.until(step, populated, timeout)
+
+    def images_loaded(self, step: str, xpath: str, timeout: float):
+        """
+        Waits for an element and every image inside it (or itself, if it is an img)
+        to settle, loaded or broken, and returns the element. Lazy images off screen are skipped.
+        """
+        return self.until(step, lambda driver: driver.execute_script(IMAGES_LOADED_SCRIPT, xpath), timeout)
+
+    def stale(self, step: str, element, timeout: float) -> bool:
+        """
+        Waits for an element to be detached from the DOM, e.g. the header of the previous chat.
+        """
+        return self.until(step, EC.staleness_of(element), timeout)
@@ -1,4 +1,8 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, NamedTuple, Optional
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -7,6 +11,42 @@ from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options
 from services import logSetup
+from services.profile_manager import ProfileManager
+
+
+class LoadProfile(NamedTuple):
+    """
+    How much of a page the browser loads: the pageLoadStrategy capability
+    (normal waits for every subresource, eager for the DOM, none for nothing)
+    and the Firefox preferences applied on top of the profile directory.
+    """
+    page_load_strategy: str
+    prefs: Dict[str, Any]
+
+
+# no autoplay, no animations, no web fonts and a capped memory cache, images still load
+_LITE_PREFS = {
+    "media.autoplay.default": 5,
+    "media.autoplay.blocking_policy": 2,
+    "ui.prefersReducedMotion": 1,
+    "toolkit.cosmeticAnimations.enabled": False,
+    "image.animation_mode": "none",
+    "browser.display.use_document_fonts": 0,
+    "browser.cache.memory.capacity": 65536,
+}
+
+LOAD_PROFILES: Dict[str, LoadProfile] = {
+    # everything, the behaviour before load profiles
+    "full": LoadProfile("normal", {}),
+    # pages whose images are read, e.g. profile pictures that must finish decoding
+    "lite": LoadProfile("eager", _LITE_PREFS),
+    # text and image urls only, images are never fetched
+    "text": LoadProfile("eager", {**_LITE_PREFS, "permissions.default.image": 2}),
+    # get() returns at once, the caller waits for its own elements
+    "minimal": LoadProfile("none", {**_LITE_PREFS, "permissions.default.image": 2}),
+}
+
+DEFAULT_LOAD_PROFILE = "full"
 
 
 class WebDriverHandler:
@@ -27,20 +67,26 @@ class WebDriverHandler:
         self.profile_path = profile_path
         self.logger = logger or logSetup.setup_logger("WebDriverHandler", "webdriverLog.txt")
 
-    def create_webdriver(self, headless: bool = False):
+    def create_webdriver(self, headless: bool = False, load_profile: Optional[str] = None):
         """
         Creates and initializes a Selenium WebDriver instance.
 
         Args:
             headless (bool): Whether to run the browser in headless mode.
+            load_profile (Optional[str]): A key of LOAD_PROFILES. Defaults to DEFAULT_LOAD_PROFILE.
 
         Returns:
             WebDriver: The initialized WebDriver instance.
 
         Raises:
+            ValueError: If the load profile is unknown.
             FileNotFoundError: If the driver or profile path is invalid.
             RuntimeError: If the WebDriver initialization fails.
         """
+        load_profile = load_profile or DEFAULT_LOAD_PROFILE
+        if load_profile not in LOAD_PROFILES:
+            raise ValueError(f"Unknown load profile: {load_profile}")
+        profile = LOAD_PROFILES[load_profile]
         try:
             # Validate paths
             if not os.path.isfile(self.driver_path):
@@ -57,10 +103,13 @@ class WebDriverHandler:
                 options.add_argument("-headless")
             options.add_argument("--profile")
             options.add_argument(self.profile_path)
+            options.page_load_strategy = profile.page_load_strategy
+            for name, value in profile.prefs.items():
+                options.set_preference(name, value)
 
             # Initialize WebDriver
             driver = webdriver.Firefox(service=Service(self.driver_path), options=options)
-            self.logger.info("WebDriver successfully created.")
+            self.logger.info(f"WebDriver successfully created with the {load_profile} load profile.")
             return driver
         except Exception as e:
             self.logger.error(f"Error creating WebDriver: {e}")
@@ -90,4 +139,217 @@ class WebDriverHandler:
             self.logger.error(f"Error checking element: {e}")
         return False
 
-    
\ No newline at end of file
+
+class PooledDriver:
+    """
+    A WebDriver kept by the pool together with its age and use count.
+    """
+
+    def __init__(self, driver: webdriver.Firefox, profile_path: str, clone_path: Optional[str] = None):
+        self.driver = driver
+        self.profile_path = profile_path
+        self.clone_path = clone_path
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class WebDriverPool:
+    """
+    Keeps pre-started WebDrivers per profile and leases them to callers,
+    so the browser cold start is paid once per pool slot instead of once per job.
+    All drivers of a pool share one load profile. With a ProfileManager every
+    slot runs on its own clone of the profile, so a profile can have size > 1.
+    """
+
+    def __init__(
+        self,
+        driver_path: str,
+        size: int = 1,
+        headless: bool = False,
+        max_age: Optional[float] = 3600,
+        max_uses: Optional[int] = 50,
+        checkout_timeout: Optional[float] = None,
+        load_profile: Optional[str] = None,
+        profile_manager: Optional[ProfileManager] = None,
+        logger=None,
+    ):
+        """
+        Initializes the pool.
+
+        Args:
+            driver_path (str): Path to the WebDriver executable.
+            size (int): Maximum number of drivers per profile.
+            headless (bool): Whether pooled browsers run headless.
+            max_age (Optional[float]): Seconds after which a driver is recycled. None disables it.
+            max_uses (Optional[int]): Leases after which a driver is recycled. None disables it.
+            checkout_timeout (Optional[float]): Seconds to wait for a free slot. None waits forever.
+            load_profile (Optional[str]): A key of LOAD_PROFILES. Defaults to DEFAULT_LOAD_PROFILE.
+            profile_manager (Optional[ProfileManager]): Clones the profile for every started driver.
+                Without it two drivers of one profile would share its directory, keep size at 1.
+            logger (optional): Custom logger instance. Defaults to a standard logger.
+        """
+        self.driver_path = driver_path
+        self.size = size
+        self.headless = headless
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.checkout_timeout = checkout_timeout
+        self.load_profile = load_profile
+        self.profile_manager = profile_manager
+        self.logger = logger or logSetup.setup_logger("WebDriverPool", "webdriverLog.txt")
+        self._idle: Dict[str, List[PooledDriver]] = {}
+        self._leased: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def _start(self, profile_path: str) -> PooledDriver:
+        started = time.monotonic()
+        clone_path = self.profile_manager.clone(profile_path) if self.profile_manager else None
+        try:
+            handler = WebDriverHandler(self.driver_path, clone_path or profile_path, logger=self.logger)
+            driver = handler.create_webdriver(headless=self.headless, load_profile=self.load_profile)
+        except Exception:
+            if clone_path:
+                self.profile_manager.remove(clone_path)
+            raise
+        self.logger.info(f"Pool started a driver for {profile_path} in {time.monotonic() - started:.2f}s")
+        return PooledDriver(driver, profile_path, clone_path)
+
+    def _stop(self, pooled: PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            self.logger.error(f"Error quitting pooled WebDriver: {e}")
+        if pooled.clone_path:
+            self.profile_manager.remove(pooled.clone_path)
+
+    def _is_expired(self, pooled: PooledDriver) -> bool:
+        if self.max_age is not None and time.monotonic() - pooled.created_at >= self.max_age:
+            return True
+        return self.max_uses is not None and pooled.uses >= self.max_uses
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def warm_up(self, profile_path: str, count: Optional[int] = None) -> None:
+        """
+        Starts drivers ahead of time so the first leases do not pay the cold start.
+
+        Args:
+            profile_path (str): Path to the Firefox profile directory.
+            count (Optional[int]): Number of drivers to start. Defaults to the pool size.
+        """
+        count = min(count or self.size, self.size)
+        with self._condition:
+            missing = count - len(self._idle.get(profile_path, [])) - self._leased.get(profile_path, 0)
+            self._leased[profile_path] = self._leased.get(profile_path, 0) + max(missing, 0)
+        started = []
+        try:
+            for _ in range(max(missing, 0)):
+                started.append(self._start(profile_path))
+        finally:
+            with self._condition:
+                self._leased[profile_path] -= max(missing, 0)
+                self._idle.setdefault(profile_path, []).extend(started)
+                self._condition.notify_all()
+
+    def acquire(self, profile_path: str) -> PooledDriver:
+        """
+        Leases a healthy driver for the profile, starting one if a slot is free.
+
+        Args:
+            profile_path (str): Path to the Firefox profile directory.
+
+        Returns:
+            PooledDriver: The leased driver, give it back with release().
+
+        Raises:
+            RuntimeError: If the pool is closed or no slot frees up in time.
+        """
+        deadline = None if self.checkout_timeout is None else time.monotonic() + self.checkout_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("WebDriverPool is closed")
+                idle = self._idle.setdefault(profile_path, [])
+                leased = self._leased.get(profile_path, 0)
+                if idle or len(idle) + leased < self.size:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise RuntimeError(f"No free WebDriver for {profile_path}")
+                self._condition.wait(remaining)
+            pooled = idle.pop() if idle else None
+            self._leased[profile_path] = leased + 1
+
+        try:
+            if pooled is None:
+                pooled = self._start(profile_path)
+            elif self._is_expired(pooled) or not self._is_healthy(pooled):
+                self.logger.info(f"Recycling WebDriver for {profile_path} after {pooled.uses} uses")
+                self._stop(pooled)
+                pooled = self._start(profile_path)
+        except Exception:
+            self._forget(profile_path)
+            raise
+        pooled.uses += 1
+        return pooled
+
+    def _forget(self, profile_path: str) -> None:
+        with self._condition:
+            self._leased[profile_path] -= 1
+            self._condition.notify_all()
+
+    def release(self, pooled: PooledDriver, discard: bool = False) -> None:
+        """
+        Gives a leased driver back to the pool.
+
+        Args:
+            pooled (PooledDriver): The driver returned by acquire().
+            discard (bool): Quit the driver instead of keeping it, e.g. after an error.
+        """
+        with self._condition:
+            self._leased[pooled.profile_path] -= 1
+            keep = not (discard or self._closed or self._is_expired(pooled))
+            if keep:
+                self._idle.setdefault(pooled.profile_path, []).append(pooled)
+            self._condition.notify_all()
+        if not keep:
+            self._stop(pooled)
+
+    @contextmanager
+    def lease(self, profile_path: str):
+        """
+        Context manager around acquire() and release(); yields the WebDriver.
+        The driver is discarded if the block raises.
+        """
+        pooled = self.acquire(profile_path)
+        try:
+            yield pooled.driver
+        except Exception:
+            self.release(pooled, discard=True)
+            raise
+        else:
+            self.release(pooled)
+
+    def close(self) -> None:
+        """
+        Quits every idle driver and refuses new leases; leased drivers are quit on release.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [pooled for drivers in self._idle.values() for pooled in drivers]
+            self._idle.clear()
+            self._condition.notify_all()
+        for pooled in idle:
+            self._stop(pooled)
+        self.logger.info("WebDriverPool closed.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the same import paths run.py sets up
+sys.path[:0] = [ROOT, os.path.join(ROOT, "models"), os.path.join(ROOT, "services")]
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # log.txt and the other relative files the modules write land in the test directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def database(tmp_path):
+    import models
+
+    engine = models.configureDatabase(f"sqlite:///{tmp_path / 'SMIF.db'}")
+    yield engine
+    models.removeSession()
+    engine.dispose()
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Starts a local HTTP server answering GETs with respond(path, headers) -> (status, body[, headers]),
+    returns it and its base url; the paths asked for are in server.requests.
+    """
+    servers = []
+
+    def start(respond):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                status, body, *headers = respond(self.path, self.headers)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                for name, value in (headers[0] if headers else {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,15 @@
+import asyncio
+
+from services.async_http_handler import AsyncHttpHandler
+
+
+def test_run_batch_works_inside_a_running_loop(stub_server):
+    server, baseUrl = stub_server(lambda path, headers: (200, path.encode()))
+    urls = [f"{baseUrl}/{i}" for i in range(5)]
+
+    async def caller():
+        return AsyncHttpHandler(concurrency=2).run_batch(urls)
+
+    results = asyncio.run(caller())
+    assert sorted(result.url for result in results) == urls
+    assert all(result.ok and result.body == result.url[len(baseUrl):].encode() for result in results)
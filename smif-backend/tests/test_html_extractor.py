@@ -0,0 +1,57 @@
+from services.html_extractor import HtmlExtractor
+
+PAGE = (
+    "<html><head><title>someone</title>"
+    "<meta charset='utf-8'>"
+    "<meta name='description' content='Playlist · someone · 12 songs'>"
+    "<meta property='og:title' content='road trip'>"
+    "</head><body><div class='header'><h1>road <b>trip</b></h1></div>"
+    + "<div class='track'><p>a song</p></div>" * 2000
+    + "<h2>the end</h2></body></html>"
+).encode()
+
+
+def chunked(body, size=64):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def test_values_are_read_from_a_chunked_page():
+    extractor = HtmlExtractor(meta=("description", "og:title"), meta_index=(2,), tags=("h1",))
+    result = extractor.extract_chunks(chunked(PAGE))
+    assert result.complete
+    assert result.values == {
+        "description": "Playlist · someone · 12 songs",
+        "og:title": "road trip",
+        "meta[2]": "Playlist · someone · 12 songs",
+        "h1": "road trip",
+    }
+    # everything is in the head and the header, the tracks are never read
+    assert result.bytes_read < len(PAGE) // 10
+
+
+def test_stop_when_ends_the_read_before_a_missing_tag():
+    extractor = HtmlExtractor(tags=("h2",), stop_when=lambda tag, attrib: "track" in attrib.get("class", ""))
+    result = extractor.extract_chunks(chunked(PAGE))
+    assert (result.values, result.complete) == ({"h2": None}, False)
+    assert result.bytes_read < len(PAGE) // 10
+
+    # without it the whole page is read to find the h2 at the end
+    result = HtmlExtractor(tags=("h2",)).extract_chunks(chunked(PAGE))
+    assert (result.values["h2"], result.bytes_read) == ("the end", len(PAGE))
+
+
+def test_head_meta_is_not_looked_for_in_the_body():
+    page = b"<html><head></head><body><meta name='description' content='late'><p>x</p></body></html>"
+    result = HtmlExtractor(meta=("description",)).extract_chunks([page])
+    assert (result.values, result.complete) == ({"description": None}, False)
+
+
+def test_extract_url_streams_the_page(stub_server):
+    server, baseUrl = stub_server(lambda path, headers: (200, PAGE) if path == "/page" else (404, b"missing"))
+    extractor = HtmlExtractor(meta=("og:title",))
+
+    result = extractor.extract_url(f"{baseUrl}/page")
+    assert (result.values["og:title"], result.response.status_code) == ("road trip", 200)
+
+    missing = extractor.extract_url(f"{baseUrl}/other")
+    assert (missing.values, missing.bytes_read, missing.response.status_code) == ({"og:title": None}, 0, 404)
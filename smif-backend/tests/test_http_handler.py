@@ -0,0 +1,106 @@
+import time
+
+from services.http_handler import HttpClient, ValidatorCache
+
+BODY = b"<html>profile</html>" * 50
+ETAG = '"v1"'
+LAST_MODIFIED = "Sat, 01 Jun 2024 10:00:00 GMT"
+
+
+def serve_validated(path, headers):
+    if headers.get("If-None-Match") == ETAG or headers.get("If-Modified-Since") == LAST_MODIFIED:
+        return 304, b""
+    return 200, BODY, {"ETag": ETAG, "Last-Modified": LAST_MODIFIED}
+
+
+def test_not_modified_replays_the_payload(stub_server):
+    server, baseUrl = stub_server(serve_validated)
+    url = f"{baseUrl}/profile"
+    cache = ValidatorCache()
+
+    first = cache.conditional_get(url)
+    assert (first.response.status_code, first.not_modified, first.entry) == (200, False, None)
+    cache.update(url, first.response, payload={"songs": 12})
+
+    second = cache.conditional_get(url)
+    assert (second.response.status_code, second.not_modified) == (304, True)
+    assert second.entry.payload == {"songs": 12}
+    assert cache.stats() == {"hits": 1, "misses": 1, "bytes_saved": len(BODY), "entries": 1}
+
+
+def test_response_without_validators_is_not_cached(stub_server):
+    server, baseUrl = stub_server(lambda path, headers: (200, BODY))
+    cache = ValidatorCache()
+    response = cache.conditional_get(f"{baseUrl}/plain").response
+    cache.update(f"{baseUrl}/plain", response, payload=1)
+    assert cache.get(f"{baseUrl}/plain") is None
+    assert cache.request_headers(f"{baseUrl}/plain") == {}
+
+
+def test_validators_survive_a_restart(stub_server, tmp_path):
+    server, baseUrl = stub_server(serve_validated)
+    url = f"{baseUrl}/profile"
+    path = str(tmp_path / "cache" / "http_validators.json")
+
+    cache = ValidatorCache(path)
+    cache.update(url, cache.conditional_get(url).response, payload="digest")
+    cache.save()
+
+    restarted = ValidatorCache(path)
+    assert restarted.request_headers(url) == {"If-None-Match": ETAG, "If-Modified-Since": LAST_MODIFIED}
+    again = restarted.conditional_get(url)
+    assert (again.not_modified, again.entry.payload) == (True, "digest")
+    assert server.requests == ["/profile", "/profile"]
+
+
+def test_oldest_entries_are_dropped(stub_server):
+    server, baseUrl = stub_server(serve_validated)
+    cache = ValidatorCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        url = f"{baseUrl}/{name}"
+        cache.update(url, cache.conditional_get(url).response)
+    assert [cache.get(f"{baseUrl}/{name}") is not None for name in ("a", "b", "c")] == [False, True, True]
+
+
+def failing_then_ok(failures, status=503, retry_after="1"):
+    arrivals = []
+
+    def respond(path, headers):
+        arrivals.append(time.monotonic())
+        if len(arrivals) <= failures:
+            return status, b"busy", {"Retry-After": retry_after}
+        return 200, b"ok"
+    return respond, arrivals
+
+
+def test_5xx_is_retried_after_the_retry_after_delay(stub_server):
+    respond, arrivals = failing_then_ok(1)
+    server, baseUrl = stub_server(respond)
+    client = HttpClient(retries=3, backoff_factor=0)
+    attempts = []
+    client.add_timing_hook(lambda method, url, status, elapsed, attempt: attempts.append((status, attempt)))
+
+    response = client.request("GET", f"{baseUrl}/feed")
+    assert (response.status_code, response.content) == (200, b"ok")
+    assert attempts == [(503, 0), (200, 1)]
+    assert arrivals[1] - arrivals[0] >= 0.9
+
+
+def test_retry_after_is_capped_and_retries_run_out(stub_server):
+    respond, arrivals = failing_then_ok(10, status=502, retry_after="3600")
+    server, baseUrl = stub_server(respond)
+    client = HttpClient(retries=2, backoff_max=0.05)
+
+    response = client.request("GET", f"{baseUrl}/feed")
+    # the last retryable status is returned once the retries are used up
+    assert response.status_code == 502
+    assert len(arrivals) == 3
+    assert arrivals[-1] - arrivals[0] < 1
+
+
+def test_methods_not_marked_safe_are_not_retried(stub_server):
+    respond, arrivals = failing_then_ok(1, retry_after="0")
+    server, baseUrl = stub_server(respond)
+    response = HttpClient(retries=3, retry_methods=("HEAD",)).request("GET", f"{baseUrl}/feed")
+    assert response.status_code == 503
+    assert len(arrivals) == 1
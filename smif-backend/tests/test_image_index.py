@@ -0,0 +1,40 @@
+import random
+
+from services.image_index import ImageIndex
+
+
+def flip(value, bits, rng):
+    for position in rng.sample(range(64), bits):
+        value ^= 1 << position
+    return value
+
+
+def test_query_finds_everything_within_the_radius(tmp_path):
+    rng = random.Random(7)
+    index = ImageIndex(path=str(tmp_path / "phash.idx"))
+    query = rng.getrandbits(64)
+    items = [(rng.getrandbits(64), f"random:{i}") for i in range(2000)]
+    # neighbours of the query at every distance up to a bit past the radius
+    items += [(flip(query, bits, rng), f"near:{bits}") for bits in range(14)]
+    assert index.add_many(items) == len(items)
+
+    for radius in (0, 3, 10):
+        expected = sorted((bin(query ^ phash).count("1"), key) for phash, key in items
+                          if bin(query ^ phash).count("1") <= radius)
+        matches = index.query(query, radius=radius)
+        assert [match.distance for match in matches] == sorted(match.distance for match in matches)
+        assert sorted((match.distance, match.key) for match in matches) == expected
+
+    assert [match.key for match in index.query(query, radius=10, limit=2)] == ["near:0", "near:1"]
+
+
+def test_index_is_reloaded_from_its_file(tmp_path):
+    path = str(tmp_path / "phash.idx")
+    index = ImageIndex(path=path)
+    assert index.add("00000000000000ff", "whatsApp:1:a.jpg")
+    assert not index.add(0xff, "whatsApp:1:a.jpg")
+
+    reloaded = ImageIndex(path=path)
+    assert len(reloaded) == 1
+    assert reloaded.query("00000000000000fe", radius=1) == index.query(0xfe, radius=1)
+    assert reloaded.query(0xfe, radius=1)[0].key == "whatsApp:1:a.jpg"
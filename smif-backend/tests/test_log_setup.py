@@ -0,0 +1,46 @@
+import logging
+import time
+
+from services.logSetup import RateLimitFilter
+
+
+def record(message, lineno=10, level=logging.INFO, name="whatsApp"):
+    return logging.LogRecord(name, level, "modules/whatsApp.py", lineno, message, None, None)
+
+
+def test_parametrised_messages_from_one_call_site_share_a_bucket():
+    limiter = RateLimitFilter(rate=1.0, burst=5)
+    passed = [limiter.filter(record(f"Starting to stream Files/{i}.jpg")) for i in range(50)]
+    assert sum(passed) == 5
+    assert len(limiter._buckets) == 1
+
+
+def test_warnings_always_pass():
+    limiter = RateLimitFilter(rate=1.0, burst=1)
+    assert all(limiter.filter(record(f"retry {i}", level=logging.WARNING)) for i in range(20))
+
+
+def test_suppressed_count_is_reported():
+    limiter = RateLimitFilter(rate=1000.0, burst=1)
+    assert limiter.filter(record("checking now"))
+    assert not limiter.filter(record("checking now"))
+    time.sleep(0.01)
+    passed = record("checking now")
+    assert limiter.filter(passed)
+    assert "suppressed" in passed.getMessage()
+
+
+def test_buckets_are_bounded():
+    limiter = RateLimitFilter(rate=1.0, burst=5, max_buckets=100)
+    for lineno in range(10000):
+        limiter.filter(record("x", lineno=lineno))
+    assert len(limiter._buckets) == 100
+
+
+def test_refilled_buckets_are_evicted():
+    limiter = RateLimitFilter(rate=1000.0, burst=1)
+    for lineno in range(500):
+        limiter.filter(record("x", lineno=lineno))
+    time.sleep(0.01)
+    limiter.filter(record("x", lineno=1000))
+    assert list(limiter._buckets) == [("whatsApp", logging.INFO, "modules/whatsApp.py", 1000)]
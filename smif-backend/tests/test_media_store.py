@@ -0,0 +1,102 @@
+import hashlib
+import os
+
+import models
+from services.http_handler import ValidatorCache
+from services.media_store import MediaStore
+
+PICTURE = b"\x89PNG not really a png" * 100
+DIGEST = hashlib.md5(PICTURE).hexdigest()
+NEW_PICTURE = b"\x89PNG another picture" * 100
+NEW_DIGEST = hashlib.md5(NEW_PICTURE).hexdigest()
+
+
+def serve_picture(stub_server):
+    def respond(path, headers):
+        if path == "/new.png":
+            return 200, NEW_PICTURE
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, b""
+        return 200, PICTURE, {"ETag": '"v1"'}
+    return stub_server(respond)
+
+
+def ref_count(digest):
+    session = models.openSession()
+    try:
+        blob = session.get(models.mediaBlob, digest)
+        return blob.refCount if blob else None
+    finally:
+        session.close()
+
+
+def test_fetch_does_not_reference_until_linked(database, stub_server, tmp_path):
+    server, baseUrl = serve_picture(stub_server)
+    store = MediaStore(root=str(tmp_path / "store"))
+
+    stored = store.fetch(f"{baseUrl}/a.png")
+    assert (stored.path, stored.digest, stored.is_new) == (None, DIGEST, True)
+    assert ref_count(DIGEST) == 0
+
+    view = str(tmp_path / "views" / "a.png")
+    store.link(DIGEST, view)
+    assert ref_count(DIGEST) == 1
+    with open(view, "rb") as file:
+        assert file.read() == PICTURE
+
+    # the same picture again, not used: the referenced blob stays and the count does not move
+    again = store.fetch(f"{baseUrl}/b.png")
+    assert (again.digest, again.is_new) == (DIGEST, False)
+    store.discard(DIGEST)
+    assert ref_count(DIGEST) == 1
+    assert os.path.exists(store.blob_path(DIGEST))
+
+
+def test_discard_collects_an_unreferenced_blob(database, stub_server, tmp_path):
+    server, baseUrl = serve_picture(stub_server)
+    store = MediaStore(root=str(tmp_path / "store"))
+
+    store.fetch(f"{baseUrl}/a.png")
+    store.discard(DIGEST)
+    assert ref_count(DIGEST) is None
+    assert not os.path.exists(store.blob_path(DIGEST))
+
+
+def test_unchanged_url_is_not_downloaded_again(database, stub_server, tmp_path):
+    server, baseUrl = serve_picture(stub_server)
+    store = MediaStore(root=str(tmp_path / "store"))
+    cache = ValidatorCache()
+
+    first = store.fetch(f"{baseUrl}/a.png", cache=cache)
+    second = store.fetch(f"{baseUrl}/a.png", cache=cache)
+    assert (second.digest, second.blob_path, second.is_new) == (first.digest, first.blob_path, False)
+    assert cache.hits == 1
+    assert os.listdir(store.temp_dir) == []
+
+    # once the blob is collected a 304 is not enough, the body is fetched again
+    store.discard(DIGEST)
+    third = store.fetch(f"{baseUrl}/a.png", cache=cache)
+    assert (third.digest, third.is_new) == (DIGEST, True)
+    assert os.path.exists(third.blob_path)
+
+
+def test_replacing_a_view_releases_the_old_blob(database, stub_server, tmp_path):
+    server, baseUrl = serve_picture(stub_server)
+    store = MediaStore(root=str(tmp_path / "store"))
+    view = str(tmp_path / "views" / "current.png")
+    other = str(tmp_path / "views" / "other.png")
+
+    store.download(f"{baseUrl}/a.png", view)
+    store.download(f"{baseUrl}/new.png", other)
+    # linking the same blob again keeps one reference
+    store.link(NEW_DIGEST, other)
+    assert (ref_count(DIGEST), ref_count(NEW_DIGEST)) == (1, 1)
+
+    store.link(NEW_DIGEST, view)
+    assert (ref_count(DIGEST), ref_count(NEW_DIGEST)) == (None, 2)
+    assert not os.path.exists(store.blob_path(DIGEST))
+    with open(view, "rb") as file:
+        assert file.read() == NEW_PICTURE
+
+    store.unlink(other, NEW_DIGEST)
+    assert ref_count(NEW_DIGEST) == 1
@@ -0,0 +1,79 @@
+import urllib.request
+
+import pytest
+
+from services import metrics
+
+
+@pytest.fixture
+def enabled():
+    metrics.enable()
+    yield
+    metrics.disable()
+
+
+def test_counter_and_histogram_render_in_the_text_format(enabled):
+    registry = metrics.Registry()
+    requests = registry.counter("smif_test_requests_total", "requests made")
+    requests.inc(host="a")
+    requests.inc(2, host="a")
+    requests.inc(host='b"c')
+    durations = registry.histogram("smif_test_step_seconds", "step durations", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        durations.observe(value, step="open")
+
+    assert (requests.value(host="a"), durations.count(step="open"), durations.total(step="open")) == (3, 4, 6.05)
+    assert registry.render() == "\n".join([
+        "# HELP smif_test_requests_total requests made",
+        "# TYPE smif_test_requests_total counter",
+        'smif_test_requests_total{host="a"} 3',
+        'smif_test_requests_total{host="b\\"c"} 1',
+        "# HELP smif_test_step_seconds step durations",
+        "# TYPE smif_test_step_seconds histogram",
+        'smif_test_step_seconds_bucket{step="open",le="0.1"} 1',
+        'smif_test_step_seconds_bucket{step="open",le="1.0"} 3',
+        'smif_test_step_seconds_bucket{step="open",le="+Inf"} 4',
+        'smif_test_step_seconds_sum{step="open"} 6.05',
+        'smif_test_step_seconds_count{step="open"} 4',
+    ]) + "\n"
+
+
+def test_nothing_is_recorded_until_enabled():
+    registry = metrics.Registry()
+    registry.counter("smif_test_idle_total").inc()
+    registry.histogram("smif_test_idle_seconds").observe(1.0)
+    assert registry.render() == "# TYPE smif_test_idle_seconds histogram\n# TYPE smif_test_idle_total counter\n"
+
+
+def test_a_name_keeps_its_kind():
+    registry = metrics.Registry()
+    registry.counter("smif_test_kind")
+    with pytest.raises(ValueError):
+        registry.histogram("smif_test_kind")
+
+
+def test_timed_calls_are_exported(enabled, tmp_path):
+    @metrics.timed("smif_test_call_seconds", "calls", module="test")
+    def call(fail=False):
+        if fail:
+            raise RuntimeError("failed")
+
+    call()
+    with pytest.raises(RuntimeError):
+        call(fail=True)
+    assert metrics.histogram("smif_test_call_seconds").count(module="test") == 2
+    assert metrics.counter("smif_test_call_errors_total").value(module="test") == 1
+
+    path = tmp_path / "smif.prom"
+    metrics.write_textfile(str(path))
+    text = path.read_text()
+    assert 'smif_test_call_seconds_count{module="test"} 2' in text
+    assert 'smif_test_call_errors_total{module="test"} 1' in text
+
+    server = metrics.start_http_server(port=0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert response.read().decode() == metrics.registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
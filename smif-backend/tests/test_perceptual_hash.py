@@ -0,0 +1,46 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from services.perceptual_hash import DEFAULT_THRESHOLD, PerceptualHash
+
+
+def picture(seed):
+    # a few random ellipses, enough structure for the hashes to tell pictures apart
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGB", (256, 256), "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.integers(0, 200, 2)
+        width, height = rng.integers(20, 90, 2)
+        draw.ellipse((x, y, x + width, y + height), fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+    return image
+
+
+def resized_jpeg(image, size):
+    buffer = io.BytesIO()
+    image.resize((size, size)).save(buffer, "JPEG", quality=70)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+@pytest.mark.parametrize("hash_function", [PerceptualHash.phash, PerceptualHash.average_hash, PerceptualHash.difference_hash])
+def test_resized_copy_is_close_and_other_picture_is_far(hash_function):
+    original, other = picture(1), picture(2)
+    copy = resized_jpeg(original, 97)
+
+    assert PerceptualHash.is_similar(hash_function(original), hash_function(copy))
+    assert PerceptualHash.hamming(hash_function(original), hash_function(other)) > DEFAULT_THRESHOLD
+
+
+def test_hex_round_trip_and_batch():
+    images = [picture(1), resized_jpeg(picture(1), 64), picture(2)]
+    hashes = PerceptualHash.phash_many(images)
+    assert hashes == [PerceptualHash.phash(image) for image in images]
+
+    hexes = [PerceptualHash.to_hex(value) for value in hashes]
+    assert all(len(value) == 16 for value in hexes)
+    assert [PerceptualHash.from_hex(value) for value in hexes] == hashes
+    assert PerceptualHash.hamming(hexes[0], hexes[2]) == PerceptualHash.hamming(hashes[0], hashes[2])
@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timedelta
+
+import models
+
+START = datetime(2024, 1, 1)
+
+
+def addTarget(session):
+    person = models.Persondb(username="target", name="target")
+    entry = models.whatsAppdb(phoneNumber="966500000000", person=person)
+    session.add(entry)
+    session.commit()
+    return entry.whatsappUserId
+
+
+def test_intervals_between_matches_every_overlapping_interval(database):
+    session = models.openSession()
+    userId = addTarget(session)
+    rnd = random.Random(4)
+    lastInterval = None
+    for second in range(0, 6000, 10):
+        lastInterval = models.presenceInterval.recordPresence(
+            session, userId, rnd.random() < 0.4, START + timedelta(seconds=second), lastInterval=lastInterval, maxGap=60)
+    session.commit()
+
+    intervals = session.query(models.presenceInterval).all()
+    for _ in range(200):
+        startTime = START + timedelta(seconds=rnd.randint(-500, 6500))
+        endTime = startTime + timedelta(seconds=rnd.randint(0, 900))
+        for status in (True, False):
+            expected = sorted((max(i.startTime, startTime), min(i.endTime, endTime)) for i in intervals
+                              if i.status == status and i.startTime <= endTime and i.endTime >= startTime)
+            assert models.presenceInterval.intervalsBetween(session, userId, startTime, endTime, status) == expected
+    session.close()
+
+
+def test_online_log_history_is_folded_once(tmp_path):
+    url = f"sqlite:///{tmp_path / 'SMIF.db'}"
+    engine = models.configureDatabase(url)
+    session = models.openSession()
+    userId = addTarget(session)
+    # polls stored as onlineLog rows, online for the first minute then offline
+    for second in range(0, 120, 10):
+        session.add(models.onlineLog(whatsappUserId=userId, status=second < 60, timeStamp=START + timedelta(seconds=second)))
+    session.commit()
+    session.close()
+    with engine.begin() as connection:
+        # as if the db was made before the data migrations
+        connection.exec_driver_sql("PRAGMA user_version = 0")
+
+    for _ in range(2):
+        engine = models.configureDatabase(url)
+    try:
+        session = models.openSession()
+        rows = session.query(models.presenceInterval.status, models.presenceInterval.startTime, models.presenceInterval.endTime) \
+            .order_by(models.presenceInterval.startTime).all()
+        assert rows == [
+            (True, START, START + timedelta(seconds=50)),
+            (False, START + timedelta(seconds=60), START + timedelta(seconds=110)),
+        ]
+        assert models.presenceInterval.compactOnlineLog(session, userId) == 0
+        session.close()
+    finally:
+        engine.dispose()
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from services.profile_manager import ProfileManager
+
+
+@pytest.fixture
+def golden(tmp_path):
+    path = tmp_path / "golden"
+    for relative, content in {
+        "prefs.js": b"user_pref('a', 1);",
+        "places.sqlite": b"SQLite format 3\x00" + b"\x00" * 1000,
+        "extensions/ublock.xpi": b"PK xpi",
+        "storage/default/idb/1.sqlite": b"SQLite format 3\x00",
+        "cache2/entries/abc": b"cached",
+        "parent.lock": b"",
+    }.items():
+        (path / relative).parent.mkdir(parents=True, exist_ok=True)
+        (path / relative).write_bytes(content)
+    os.symlink("127.0.0.1:+1234", path / "lock")
+    return path
+
+
+def test_clone_has_the_profile_without_locks_or_caches(golden, tmp_path):
+    manager = ProfileManager(str(golden), clones_root=str(tmp_path / "clones"))
+    clone = manager.clone()
+
+    files = sorted(os.path.relpath(os.path.join(directory, name), clone)
+                   for directory, _, names in os.walk(clone) for name in names)
+    assert files == ["extensions/ublock.xpi", "places.sqlite", "prefs.js", "storage/default/idb/1.sqlite"]
+    stats = manager.stats(clone)
+    assert (stats.reflinked + stats.hardlinked + stats.copied, stats.skipped) == (4, 2)
+
+    # writes to a clone's databases never reach the golden profile
+    with open(os.path.join(clone, "places.sqlite"), "r+b") as file:
+        file.write(b"changed")
+    assert (golden / "places.sqlite").read_bytes().startswith(b"SQLite format 3")
+
+
+def test_clones_are_removed(golden, tmp_path):
+    manager = ProfileManager(str(golden), clones_root=str(tmp_path / "clones"))
+    with manager.lease() as leased:
+        assert os.path.isdir(leased)
+    assert not os.path.exists(leased)
+
+    kept = manager.clone()
+    # left behind by a process that is gone, and a directory the manager does not own
+    dead = tmp_path / "clones" / "clone-999999999-0"
+    dead.mkdir()
+    other = tmp_path / "clones" / "notes"
+    other.mkdir()
+
+    assert manager.cleanup() == 2
+    assert not os.path.exists(kept) and not dead.exists()
+    assert other.exists()
+    assert manager.stats(kept) is None
+    assert (golden / "prefs.js").read_bytes() == b"user_pref('a', 1);"
@@ -0,0 +1,79 @@
+import models
+from modules.spotify import Spotify, SpotifyTracker
+
+
+def playlistPage(songs):
+    return (
+        "<html><head><title>playlist</title>"
+        f"<meta property='og:description' content='Playlist · someone · {songs} songs · 1.2K saves'>"
+        "</head><body><div id='main'></div></body></html>"
+    ).encode()
+
+
+def addPerson(username="target"):
+    session = models.openSession()
+    session.add(models.Persondb(username=username, name=username))
+    session.commit()
+    session.close()
+
+
+def test_tracked_playlist_is_swept(database, stub_server):
+    server, baseUrl = stub_server(lambda path, headers: (200, playlistPage(12)))
+    addPerson()
+    playlistUrl = f"{baseUrl}/playlist/abc"
+    assert Spotify(username="target", playlistUrl=playlistUrl).trackPlaylist()
+
+    tracker = SpotifyTracker(concurrency=4)
+    session = models.openSession()
+    assert list(tracker.loadPlaylists(session)) == [playlistUrl]
+    session.close()
+
+    totals = tracker.sweep()
+    assert (totals['fetched'], totals['changed'], totals['failed']) == (1, 1, 0)
+    assert server.requests == ["/playlist/abc"]
+
+    session = models.openSession()
+    entry = session.query(models.Spotify).one()
+    assert entry.playlistUrl == playlistUrl
+    assert entry.playlistSongsNumber == 12
+    assert [(log.oldSongsNumber, log.songsNumber) for log in entry.songsLog] == [(None, 12)]
+    session.close()
+
+    # nothing changed, nothing logged
+    totals = tracker.sweep()
+    assert (totals['fetched'], totals['changed']) == (1, 0)
+
+
+def test_store_new_number_keeps_the_playlist_url(database):
+    addPerson()
+    spotify = Spotify(username="target", playlistUrl="https://open.spotify.com/playlist/abc")
+    spotify.currentNumber = 7
+    assert spotify.storeNewNumber()
+
+    session = models.openSession()
+    entry = session.query(models.Spotify).one()
+    assert (entry.playlistUrl, entry.playlistSongsNumber) == ("https://open.spotify.com/playlist/abc", 7)
+    session.close()
+
+
+def test_playlist_url_is_added_to_an_old_spotify_table(tmp_path):
+    from sqlalchemy import create_engine, text
+
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        # the spotify table as created before playlistUrl existed
+        connection.execute(text("CREATE TABLE spotify (Id INTEGER PRIMARY KEY, personId INTEGER, "
+                                "playlistSongsNumber INTEGER, storedDate DATETIME)"))
+        connection.execute(text("INSERT INTO spotify (Id, playlistSongsNumber) VALUES (1, 3)"))
+    engine.dispose()
+
+    engine = models.configureDatabase(url)
+    try:
+        session = models.openSession()
+        entry = session.query(models.Spotify).one()
+        assert (entry.playlistUrl, entry.playlistSongsNumber) == (None, 3)
+        session.close()
+        assert models.migrateDatabase(engine) == []
+    finally:
+        engine.dispose()
@@ -0,0 +1,33 @@
+from services.tiered_fetcher import NOT_FOUND, TieredFetcher
+
+
+class Source:
+    fetchTiers = {'protected': ('httpCheck', 'browserCheck')}
+
+    def __init__(self, httpValue):
+        self.httpValue = httpValue
+        self.browserCalls = 0
+
+    def httpCheck(self):
+        return self.httpValue
+
+    def browserCheck(self):
+        self.browserCalls += 1
+        return True
+
+
+def test_empty_http_answer_escalates_to_the_browser():
+    fetcher = TieredFetcher()
+    source = Source(None)
+    outcome = fetcher.fetch(source, 'protected')
+    assert (outcome.value, outcome.tier, source.browserCalls) == (True, "browser", 1)
+
+
+def test_not_found_is_definitive():
+    fetcher = TieredFetcher()
+    source = Source(NOT_FOUND)
+    outcome = fetcher.fetch(source, 'protected')
+    assert (outcome.value, outcome.tier, source.browserCalls) == (NOT_FOUND, "http", 0)
+    assert not outcome.value
+    stats = fetcher.stats()["source.protected"]
+    assert (stats["http"]["not_found"], stats["browser"]["attempts"], stats["browser_rate"]) == (1, 0, 0)
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from modules.twitterBatch import TwitterBatchChecker, protectedText
+from services.async_http_handler import HostRateLimiter
+
+PROTECTED_PAGE = (
+    "<html><head><title>xcancel</title></head><body><div class='timeline-container'>"
+    f"<div class='timeline-header timeline-protected'><h2>{protectedText}</h2></div>"
+    "</div></body></html>"
+).encode()
+PUBLIC_PAGE = (
+    "<html><head><title>xcancel</title></head><body><div class='timeline'>"
+    + "<div class='timeline-item'><p>tweet text</p></div>" * 50
+    + "<h2>not a protected notice</h2></div></body></html>"
+).encode()
+MISSING_PAGE = b"<html><body><div class='error-panel'>User not found</div></body></html>"
+
+
+def stand_in(path, headers):
+    # usernames starting with p are protected, missing ones are not found
+    username = path.strip("/")
+    if username.startswith("missing"):
+        return 404, MISSING_PAGE
+    return 200, PROTECTED_PAGE if username.startswith("p") else PUBLIC_PAGE
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    async def run():
+        limiter = HostRateLimiter(rate=20)
+        times = {"a": [], "b": []}
+
+        async def request(host):
+            await limiter.wait(f"http://{host}.example/x")
+            times[host].append(time.monotonic())
+
+        await asyncio.gather(*(request(host) for host in ["a"] * 5 + ["b"] * 5))
+        return times
+
+    times = asyncio.run(run())
+    for host in ("a", "b"):
+        gaps = [later - earlier for earlier, later in zip(times[host], times[host][1:])]
+        assert min(gaps) >= 0.05 * 0.9
+    # the hosts are spaced on their own, b did not wait behind a
+    assert abs(times["a"][0] - times["b"][0]) < 0.03
+
+
+def test_checker_classifies_protected_public_and_errors(stub_server):
+    server, baseUrl = stub_server(stand_in)
+    usernames = ["p1", "u1", "p2", "u2", "missing1"]
+    seen = []
+    checker = TwitterBatchChecker(baseUrl=baseUrl, concurrency=4, perHost=4, ratePerHost=100.0)
+    checks = {check.username: check for check in checker.check(usernames, onResult=seen.append)}
+
+    assert sorted(checks) == sorted(usernames)
+    assert [checks[name].protected for name in ("p1", "p2", "u1", "u2")] == [True, True, False, False]
+    assert checks["missing1"].protected is None
+    assert checks["missing1"].status == 404
+    assert checks["missing1"].error == "status 404"
+    assert len(seen) == len(usernames)
+
+
+def test_checker_respects_the_host_rate(stub_server):
+    arrivals = []
+
+    def respond(path, headers):
+        arrivals.append(time.monotonic())
+        return stand_in(path, headers)
+
+    server, baseUrl = stub_server(respond)
+    checker = TwitterBatchChecker(baseUrl=baseUrl, concurrency=8, perHost=8, ratePerHost=10.0)
+    checks = checker.check(f"u{i}" for i in range(6))
+
+    assert all(check.protected is False for check in checks)
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    assert min(gaps) >= 0.1 * 0.8
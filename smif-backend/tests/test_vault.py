@@ -0,0 +1,60 @@
+import json
+
+import pytest
+from cryptography.fernet import Fernet
+
+from services.vault import DEFAULT_ITERATIONS, LEGACY_SALT, Vault
+
+TOKENS = {"spotify": {"client_id": "abc", "client_secret": "s3cret"}, "twitter": ["bearer"]}
+ITERATIONS = 1000
+
+
+def test_round_trip_derives_the_key_once(tmp_path):
+    path = str(tmp_path / "tokens.enc")
+    vault = Vault()
+    vault.write_secret(path, TOKENS, "correct horse", iterations=ITERATIONS)
+    assert b"s3cret" not in (tmp_path / "tokens.enc").read_bytes()
+
+    assert vault.read_secret(path, "correct horse") == TOKENS
+    assert vault.read_secret(path, "correct horse") == TOKENS
+    assert vault.derivations == 1
+
+    # another process reads it with only the password
+    assert Vault().read_secret(path, "correct horse") == TOKENS
+
+
+def test_wrong_password_fails(tmp_path):
+    path = str(tmp_path / "tokens.enc")
+    Vault().write_secret(path, TOKENS, "correct horse", iterations=ITERATIONS)
+    vault = Vault()
+    with pytest.raises(ValueError):
+        vault.read_secret(path, "battery staple")
+    # the failure is not cached, the right password still works
+    assert vault.read_secret(path, "correct horse") == TOKENS
+
+
+def test_corrupted_file_fails(tmp_path):
+    path = tmp_path / "tokens.enc"
+    Vault().write_secret(str(path), TOKENS, "correct horse", iterations=ITERATIONS)
+    blob = bytearray(path.read_bytes())
+    blob[-10] ^= 0xff
+    path.write_bytes(bytes(blob))
+    with pytest.raises(ValueError):
+        Vault().read_secret(str(path), "correct horse")
+
+
+def test_rewritten_file_is_read_again(tmp_path):
+    path = str(tmp_path / "tokens.enc")
+    vault = Vault(ttl=None)
+    vault.write_secret(path, TOKENS, "correct horse", iterations=ITERATIONS)
+    assert vault.read_secret(path, "correct horse") == TOKENS
+    vault.write_secret(path, {"rotated": True}, "correct horse", iterations=ITERATIONS)
+    assert vault.read_secret(path, "correct horse") == {"rotated": True}
+
+
+def test_legacy_file_without_header_is_read(tmp_path):
+    path = tmp_path / "legacy.enc"
+    vault = Vault()
+    key = vault.derive_key("correct horse", LEGACY_SALT, DEFAULT_ITERATIONS)
+    path.write_bytes(Fernet(key).encrypt(json.dumps(TOKENS).encode()))
+    assert vault.read_secret(str(path), "correct horse") == TOKENS
@@ -0,0 +1,34 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from services.wait_handler import StepTimings, WaitHandler
+
+
+def test_timeout_is_learned_from_successes():
+    timings = StepTimings(margin=3.0, min_timeout=0.1, min_samples=5)
+    assert timings.timeout_for("openContact", 30) == 30
+    for _ in range(5):
+        timings.record("openContact", 1.0)
+    assert timings.timeout_for("openContact", 30) == pytest.approx(3.0)
+
+
+def test_timeouts_are_kept_as_samples():
+    timings = StepTimings(margin=3.0, min_timeout=0.1, min_samples=5, window=10)
+    for _ in range(5):
+        timings.record("openContact", 1.0)
+    for _ in range(5):
+        timings.record_timeout("openContact", 3.0)
+    # a success clears the backoff, the waits that timed out still lift the p95
+    timings.record("openContact", 1.0)
+    assert timings.timeout_for("openContact", 30) == pytest.approx(9.0)
+    assert timings.stats()["openContact"]["timeouts"] == 5
+
+
+def test_until_records_the_time_waited_on_timeout():
+    timings = StepTimings()
+    waits = WaitHandler(driver=object(), timings=timings, poll=0.01)
+    with pytest.raises(TimeoutException):
+        waits.until("never", lambda driver: False, 0.05)
+    stats = timings.stats()["never"]
+    assert (stats["samples"], stats["timeouts"]) == (1, 1)
+    assert stats["max"] >= 0.05
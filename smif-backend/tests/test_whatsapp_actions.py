@@ -0,0 +1,55 @@
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webelement import WebElement
+
+from modules.whatsApp import WhatsApp
+
+
+class StubElement(WebElement):
+    def __init__(self, parent, id_, text=""):
+        super().__init__(parent, id_)
+        self._text = text
+
+    @property
+    def text(self):
+        return self._text
+
+
+class StubDriver:
+    """
+    Enough of a remote WebDriver for ActionChains: it records the W3C actions it is sent.
+    """
+
+    def __init__(self, headerText):
+        self.actions = []
+        self.body = StubElement(self, "body")
+        self.header = StubElement(self, "header", headerText)
+
+    def find_element(self, by, value):
+        return self.body if value == "body" else self.header
+
+    def execute(self, command, params=None):
+        if command == Command.W3C_ACTIONS:
+            self.actions.append(params["actions"])
+        return {"value": None}
+
+
+def target(driver):
+    whatsApp = WhatsApp(phoneNumber="966500000000", name="target", username="target")
+    whatsApp.driver = driver
+    return whatsApp
+
+
+def test_is_active_now_reads_the_header():
+    driver = StubDriver("online")
+    assert target(driver).isActiveNow() is True
+    assert target(StubDriver("last seen today at 10:00")).isActiveNow() is False
+    # both hovers were sent to the browser
+    assert len(driver.actions) == 2
+
+
+def test_send_keys_types_into_the_page():
+    driver = StubDriver("")
+    target(driver).sendKeys(word="966500000000")
+    keys = [action["value"] for source in driver.actions[0] if source["type"] == "key"
+            for action in source["actions"] if action["type"] == "keyDown"]
+    assert "".join(keys) == "966500000000"
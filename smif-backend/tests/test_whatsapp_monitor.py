@@ -0,0 +1,68 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from modules.whatsApp import WhatsApp, WhatsAppMonitor
+
+
+class StubTarget(WhatsApp):
+    """
+    A target that is always online and counts what the monitor asks of it.
+    """
+
+    def __init__(self, phoneNumber):
+        super().__init__(phoneNumber=phoneNumber, name=phoneNumber, username=phoneNumber)
+        self.stored = 0
+        self.commits = 0
+
+    def switchToContact(self):
+        return True
+
+    def isActiveNow(self):
+        return True
+
+    def storeActiveStatus(self, activeResult, timeStamp=None):
+        self.stored += 1
+
+    def commitSession(self):
+        self.commits += 1
+
+
+class StubPushTarget(StubTarget):
+    """
+    A target whose page observer buffered one transition before every drain.
+    """
+
+    def __init__(self, phoneNumber):
+        super().__init__(phoneNumber)
+        self.persondb = SimpleNamespace(whatsappEntries=[])
+        self.drains = 0
+
+    def getWhatsAppEntry(self, entries):
+        return None
+
+    def drainPresence(self):
+        self.drains += 1
+        self.pushCheckedAt = datetime.now()
+        return [(self.pushCheckedAt, self.drains % 2 == 1)]
+
+
+def test_every_cycle_is_committed_and_duplicate_numbers_are_kept_apart():
+    targets = [StubTarget("966500000000"), StubTarget("966500000000"), StubTarget("966500000001")]
+    monitor = WhatsAppMonitor(targets)
+    monitor.driver = object()
+
+    report = monitor.monitorOnline(2, 1)
+
+    cycles = targets[0].stored
+    assert cycles >= 2
+    assert [target.commits for target in targets] == [cycles] * 3
+    assert [entry['phoneNumber'] for entry in report['targets']] == [target.person.phoneNumber for target in targets]
+    assert [entry['samples'] for entry in report['targets']] == [cycles] * 3
+    assert report['samples'] == 3 * cycles
+
+
+def test_every_drain_is_committed():
+    target = StubPushTarget("966500000000")
+    target.monitorOnlinePush(2, drainInterval=1)
+    assert target.drains >= 2
+    assert target.commits == target.drains